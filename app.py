@@ -1,13 +1,26 @@
+import os
+import time
+from functools import partial
 import streamlit as st
-import yfinance as yf
 import pandas as pd
-import numpy as np
-from lppls import lppls
 import plotly.graph_objects as go
 import plotly.express as px
+from quotes import fetch_quotes, value_portfolio
+import price_store
+import lppls_engine
+import indicators
+import refresher
+import metadata
+import batch_scan
+import portfolio
+import lppls_confidence
+import perf
+import charts
+import dataplane
 
 # 1. Page Configuration
 st.set_page_config(page_title="Dragon King Theory", layout="wide")
+run = perf.start_run("app")
 
 # 2. Cyber Blue Style & Fixed Tooltip
 st.markdown("""
@@ -91,7 +104,18 @@ st.markdown('<h1 class="main-title" title="龍王理論：資産運用ターミ
 with st.sidebar:
     st.markdown('<h2 title="監視銘柄の入力">🔍 SCAN TARGETS</h2>', unsafe_allow_html=True)
     ticker_input = st.text_input("SCAN TICKERS", value="XRP-USD, 7203.T, 3140.T, AAPL", help="分析したい銘柄コードをカンマ区切りで入力。日本株は末尾に .T").upper()
-    tickers = [t.strip() for t in ticker_input.split(",")]
+    # 空の項目と重複を除く (同じ銘柄のパネルやウィジェットのキーが重ならないように)
+    tickers = list(dict.fromkeys(t for t in (s.strip() for s in ticker_input.split(",")) if t))
+    metadata.warm(tickers)
+    interval = st.selectbox("INTERVAL", list(price_store.INTERVALS), index=3, help="足の種類。5m/1h は 1 分足から、1wk は日足からまとめて作る（RSI・LPPLS もこの足で計算）")
+    w1, w2 = st.columns(2)
+    fit_workers = w1.number_input("FIT WORKERS", min_value=1, max_value=64, value=min(os.cpu_count() or 1, 64), help="このセッションが同時に投げる LPPLS フィットの数（プロセスプールは全セッション共有で、大きさは DRAGON_FIT_WORKERS か CPU 数）")
+    fit_timeout = w2.number_input("FIT TIMEOUT", min_value=5, max_value=600, value=60, help="1 銘柄あたりのフィット制限時間（秒）")
+    show_conf = st.checkbox("CONFIDENCE SWEEP", value=False, help="複数の窓で LPPLS をフィットし、バブル信号の信頼度を表示（重い）")
+    lazy_panels = st.checkbox("LAZY PANELS", value=True, help="銘柄ごとに要約だけを先に表示し、重い解析は開いたときに実行")
+    show_fleet = st.checkbox("FLEET ANALYTICS", value=False, help="保有銘柄の履歴から評価額推移・ドローダウン・ボラティリティ・相関・寄与を表示")
+    show_perf = st.checkbox("PERF PANEL", value=False, help="処理区間ごとの所要時間とキャッシュ状況を表示")
+    perf_box = st.empty()
 
     st.divider()
     st.markdown('<h2 title="保有艦隊データ">🛸 FLEET DATA</h2>', unsafe_allow_html=True)
@@ -110,27 +134,51 @@ with st.sidebar:
         st.rerun()
 
 # 5. Functions
+# 取得はバックグラウンドの refresher に任せ、ここではスナップショットを読むだけ
+@st.cache_data(max_entries=64, show_spinner=False)
+def get_confidence(df, workers):
+    return lppls_confidence.confidence(df, workers=workers)
+
+def read_hist(t_code, wait=0.0):
+    # 選んだ足の履歴。1 分足を元にする足は 1 分ごとに取り直す
+    return refresher.shared().read(("bars", t_code, interval, "2025-08-01"),
+                                   partial(price_store.load_bars, t_code, interval, "2025-08-01"), wait=wait,
+                                   interval=60 if price_store.is_intraday(interval) else None)
+
+def series_key(t_code):
+    # LPPLS の前回解・チャートのキャッシュは足ごとに分ける (日足は従来どおり銘柄コードのみ)
+    return t_code if interval == "1d" else f"{t_code}@{interval}"
+
+def get_fleet(data_list, quotes_snap):
+    syms = tuple(sorted({item["銘柄"] for item in data_list if item["数量"] > 0}))
+    hist = refresher.shared().read(("fleet", syms), partial(batch_scan.fetch_all, list(syms), portfolio.history_start()), wait=5)
+    if hist is None or not hist.value:
+        return None
+    # 保有内容か履歴が変わったときだけ組み直し、それ以外は最新の相場で最終バーだけを書き換える
+    key = (tuple((d["銘柄"], d["単価"], d["数量"]) for d in data_list), hist.fetched_at)
+    fleet = st.session_state.get("fleet")
+    if fleet is None or st.session_state.get("fleet_key") != key:
+        fleet = portfolio.Portfolio(data_list).load(indicators.panel(hist.value))
+        st.session_state.fleet, st.session_state.fleet_key = fleet, key
+    if quotes_snap is not None and quotes_snap.value is not None:
+        fleet.update(quotes_snap.value["price"].dropna())
+    return fleet
+
 def get_live_pf(data_list):
-    res = []
-    t_cost, t_val = 0, 0
-    for item in data_list:
-        try:
-            t, p, q = item["銘柄"], item["単価"], item["数量"]
-            if q <= 0: continue
-            df = yf.download(t, period="1d", progress=False)
-            curr_p = float(df['Close'].iloc[-1])
-            val, cost = curr_p * q, p * q
-            res.append({"銘柄": t, "評価額": val, "損益": val - cost})
-            t_cost += cost
-            t_val += val
-        except: continue
-    return pd.DataFrame(res), t_cost, t_val
+    syms = tuple(sorted({item["銘柄"] for item in data_list if item["数量"] > 0}))
+    # 他のプロセスが直近に取った相場があればそれを共有する
+    fetch = partial(dataplane.shared, ("quotes", syms), partial(fetch_quotes, list(syms)), 60)
+    snap = refresher.shared().read(("quotes", syms), fetch, wait=3, interval=60)
+    if snap is None or snap.value is None:
+        return pd.DataFrame(), 0, 0, snap
+    return (*value_portfolio(data_list, snap.value), snap)
 
 # 6. Main Dashboard
 st.markdown('<div class="portfolio-card">', unsafe_allow_html=True)
 st.markdown("<h3 title='艦隊評価額の合計' style='color:#00f2ff; text-align:center;'>🌌 TOTAL ASSET VALUE</h3>", unsafe_allow_html=True)
 
-pf_df, total_cost, total_value = get_live_pf(pf_data_list)
+with perf.span("portfolio"):
+    pf_df, total_cost, total_value, pf_snap = get_live_pf(pf_data_list)
 if not pf_df.empty:
     c1, c2, c3 = st.columns([1.5, 1.5, 2])
     c1.metric("TOTAL VALUE", f"¥{total_value:,.0f}" if "T" in ticker_input else f"${total_value:,.2f}", help="現在の総評価額（円/ドル）")
@@ -140,39 +188,112 @@ if not pf_df.empty:
     fig_pie.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font_color="#00f2ff", height=180, showlegend=False)
     fig_pie.update_traces(marker=dict(colors=['#00f2ff', '#00d1ff', '#00a0ff', '#0070ff']))
     c3.plotly_chart(fig_pie, use_container_width=True)
+    st.caption(f"QUOTES @ {refresher.freshness(pf_snap)}")
+    if show_fleet:
+        with perf.span("fleet"):
+            fleet = get_fleet(pf_data_list, pf_snap)
+        if fleet is not None and len(fleet.index) > 1:
+            f1, f2, f3 = st.columns(3)
+            f1.metric("MAX DRAWDOWN", f"{fleet.max_drawdown() * 100:.2f}%", help="期間中の評価額の最大下落率")
+            f2.metric("VOLATILITY", f"{fleet.volatility() * 100:.2f}%", help="年率ボラティリティ（現在の比率で加重）")
+            f3.metric("PERIOD RETURN", f"{(fleet.equity[-1] / fleet.equity[0] - 1) * 100:.2f}%", help=f"{fleet.index[0]:%Y-%m-%d} からの評価額の変化（現在の保有数量で計算）")
+            curve = fleet.curve().rename(columns={"評価額": "Close"})
+            st.plotly_chart(charts.price_figure("FLEET", curve, "cyber"), use_container_width=True)
+            fig_corr = px.imshow(fleet.corr(), zmin=-1, zmax=1, color_continuous_scale=['#ff3366', '#050a14', '#00f2ff'])
+            fig_corr.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font_color="#00f2ff", height=300, margin=dict(l=0, r=0, t=0, b=0))
+            st.plotly_chart(fig_corr, use_container_width=True)
+            st.dataframe(fleet.contribution().style.format({"評価額": "{:,.2f}", "比率": "{:.1%}", "損益": "{:,.2f}", "期間寄与": "{:.2%}", "ボラティリティ": "{:.1%}", "リスク寄与": "{:.1%}"}), use_container_width=True)
 else:
     st.markdown('<p style="color:#00f2ff; text-align:center; border:1px dashed #00f2ff; padding:20px;" title="サイドバーでデータを入力してください">⚠️ SYSTEM IDLE: PLEASE ENTER FLEET DATA.</p>', unsafe_allow_html=True)
 st.markdown('</div>', unsafe_allow_html=True)
 
 # 7. Analysis Section
+with perf.span("info"):
+    meta_snap = refresher.shared().read(("meta", tuple(tickers)), partial(metadata.prefetch, tickers, strict=True), wait=2, interval=6 * 3600)
+meta = meta_snap.value if meta_snap and meta_snap.value else {}
+panels = {}
+
+def render_panel(t_code):
+    with perf.span("fetch", t_code):
+        hist = read_hist(t_code, wait=3)
+    if hist is None or hist.value is None or hist.value.empty:
+        st.caption(f"DATA @ {refresher.freshness(hist)}")
+        return
+    df = hist.value
+    info = meta.get(t_code, {})
+    div_yield = info.get('dividendYield', 0)
+    div_text = f"{div_yield * 100:.2f}%" if div_yield else "N/A"
+    last_p = float(df['Close'].iloc[-1])
+
+    ca, cb, cc = st.columns(3)
+    ca.metric("PRICE", f"{last_p:,.2f}", help="現在の市場価格")
+    cb.metric("DIV YIELD", div_text, help="予想配当利回り")
+    xday = cc.empty()
+    xday.metric("X-DAY", "SCANNING...", help="トレンド変化の臨界点（予測日）")
+    panels[t_code] = (xday, lppls_engine.observations(df))
+
+    with perf.span("chart", t_code):
+        st.plotly_chart(charts.price_figure(series_key(t_code), df, "cyber"), use_container_width=True)
+    if show_conf:
+        with perf.span("lppls_confidence", t_code):
+            conf = get_confidence(df[['Close']], int(fit_workers))
+        fig_conf = go.Figure([go.Bar(x=conf.index, y=conf['pos_conf'], marker_color='#00f2ff', name='BUBBLE'),
+                              go.Bar(x=conf.index, y=-conf['neg_conf'], marker_color='#ff3366', name='ANTI-BUBBLE')])
+        fig_conf.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', height=120, margin=dict(l=0,r=0,t=0,b=0), font_color="#00f2ff", barmode='relative', showlegend=False, xaxis=dict(showgrid=False), yaxis=dict(range=[-1, 1], showgrid=True, gridcolor='#112244'))
+        st.plotly_chart(fig_conf, use_container_width=True)
+    st.caption(f"DATA @ {refresher.freshness(hist)}")
+
+def render_summary(t_code):
+    # 軽い要約行: 手元にあるデータだけで価格と RSI を出し、取得は待たない
+    hist = read_hist(t_code)
+    df = hist.value if hist and hist.value is not None else price_store.read(t_code) if interval == "1d" else None
+    s1, s2, s3, s4 = st.columns([2, 1.5, 1.5, 1])
+    s1.markdown(f"🛰️ **{t_code}**")
+    if df is not None and not df.empty:
+        s2.markdown(f"PRICE **{float(df['Close'].iloc[-1]):,.2f}**")
+        s3.markdown(f"RSI **{indicators.rsi(df['Close'], last=True).iloc[0]:.1f}**")
+    else:
+        s2.markdown("LOADING...")
+    return s4.toggle("SCAN", key=f"open_{t_code}", help="LPPLS とチャートを計算して表示")
+
 for t_code in tickers:
     try:
-        with st.expander(f"🛰️ SCANNING: {t_code}", expanded=True):
-            stock = yf.Ticker(t_code)
-            df = stock.history(start="2025-08-01")
-            info = stock.info
-            div_yield = info.get('dividendYield', 0)
-            div_text = f"{div_yield * 100:.2f}%" if div_yield else "N/A"
-            last_p = float(df['Close'].iloc[-1])
-            
-            # Indicators
-            delta = df['Close'].diff(); gain = (delta.where(delta > 0, 0)).rolling(14).mean(); loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
-            rsi = 100 - (100 / (1 + (gain / loss))).iloc[-1]
-
-            # LPPLS
-            df_c = df[['Close']].dropna().reset_index()
-            time = [pd.Timestamp.toordinal(d) for d in df_c['Date']]
-            price = np.log(df_c['Close'].values.flatten())
-            model = lppls.LPPLS(observations=np.array([time, price]))
-            tc, m, w, a, b, c, c1, c2, O, D = model.fit(max_searches=20)
-            crit_date = pd.Timestamp.fromordinal(int(tc)).strftime('%Y-%m-%d')
-
-            ca, cb, cc = st.columns(3)
-            ca.metric("PRICE", f"{last_p:,.2f}", help="現在の市場価格")
-            cb.metric("DIV YIELD", div_text, help="予想配当利回り")
-            cc.metric("X-DAY", crit_date, help="トレンド変化の臨界点（予測日）")
-
-            fig = go.Figure(data=[go.Scatter(x=df.index, y=df['Close'], line=dict(color='#00f2ff', width=2))])
-            fig.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', height=220, margin=dict(l=0,r=0,t=0,b=0), font_color="#00f2ff", xaxis=dict(showgrid=False), yaxis=dict(showgrid=True, gridcolor='#112244'))
-            st.plotly_chart(fig, use_container_width=True)
-    except: continue
+        if lazy_panels:
+            with st.container(border=True):
+                if render_summary(t_code):
+                    render_panel(t_code)
+        else:
+            with st.expander(f"🛰️ SCANNING: {t_code}", expanded=True):
+                render_panel(t_code)
+    except Exception as e:
+        perf.error("panel", e, t_code)
+        continue
+
+# 8. LPPLS Scan (終わった銘柄から X-DAY を埋める)
+# 夜間スキャン (batch_scan.py, 日足) が同じ期間 (最初と最後のバーが一致) でフィット済みならそれを使う
+snapshot = batch_scan.load_snapshot() if interval == "1d" else pd.DataFrame()
+obs_map = {}
+names = {}
+for t, (xday, obs) in panels.items():
+    row = snapshot.loc[t] if t in snapshot.index and "first_bar" in snapshot else None
+    if (row is not None and pd.notna(row["crit_date"])
+            and pd.Timestamp(row["first_bar"]).toordinal() == int(obs[0, 0])
+            and pd.Timestamp(row["last_bar"]).toordinal() == int(obs[0, -1])):
+        xday.metric("X-DAY", row["crit_date"].strftime('%Y-%m-%d'), help="トレンド変化の臨界点（予測日・夜間スキャン）")
+    else:
+        obs_map[series_key(t)] = obs
+        names[series_key(t)] = t
+xday_fmt = '%Y-%m-%d %H:%M' if price_store.is_intraday(interval) else '%Y-%m-%d'
+scan_t0 = time.perf_counter()
+for key, fit, err in lppls_engine.scan(obs_map, max_searches=20, workers=int(fit_workers), timeout=fit_timeout):
+    t_code = names[key]
+    # 並列なので、スキャン開始から結果が届くまでの時間をその銘柄の区間とする
+    run.add_span("lppls_fit", t_code, time.perf_counter() - scan_t0)
+    if err:
+        run.add(f"lppls.{err}")
+    crit_date = lppls_engine.to_timestamp(fit.tc).strftime(xday_fmt) if fit else err
+    panels[t_code][0].metric("X-DAY", crit_date, help="トレンド変化の臨界点（予測日）")
+
+# 9. Performance Panel
+if show_perf:
+    perf.render(perf_box.container(), run)
@@ -0,0 +1,109 @@
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+import indicators
+import lppls_engine
+from paths import CACHE_DIR
+from price_store import load_many
+
+# --- ヘッドレス一括スキャン ---
+# ダッシュボードと同じ取得・指標・LPPLS を大量の銘柄に対して実行し、結果を Parquet に書き出す。
+# 夜間に回しておけば、画面はスナップショットを読むだけで済む。
+#
+#   python batch_scan.py universe.txt --workers 16 --out .cache/snapshot.parquet
+
+SNAPSHOT_PATH = CACHE_DIR / "snapshot.parquet"
+START = "2025-08-01"
+
+
+def read_universe(path):
+    """1 行 1 銘柄 (カンマ区切りも可、# 以降はコメント) のファイルを読む。"""
+    out = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0]
+            out += [t.strip().upper() for t in line.split(",") if t.strip()]
+    return list(dict.fromkeys(out))
+
+
+def fetch_all(symbols, start=START, workers=4):
+    """start 以降の日足を返す。古いものだけを price_store.load_many が BATCH 銘柄ずつ 1 回の取得にまとめる。"""
+    frames = load_many(symbols, start, workers=workers)
+    return {sym: df for sym, df in frames.items() if len(df) > 30}
+
+
+def analyze(frames, fit_workers=None, timeout=60, max_searches=20, on_fit=None):
+    """{銘柄: OHLCV} から指標と LPPLS の結果を 1 行 1 銘柄の DataFrame にまとめる。"""
+    if not frames:
+        return pd.DataFrame()
+    res = indicators.summary(indicators.panel(frames))
+    res["first_bar"] = [frames[s].index[0] for s in res.index]
+    res["last_bar"] = [frames[s].index[-1] for s in res.index]
+    for col in ("tc", "m", "w", "O", "D"):
+        res[col] = float("nan")
+    res["fit_error"] = None
+    obs_map = {sym: lppls_engine.observations(df) for sym, df in frames.items()}
+    for sym, fit, err in lppls_engine.scan(obs_map, max_searches=max_searches, workers=fit_workers, timeout=timeout):
+        if fit:
+            res.loc[sym, ["tc", "m", "w", "O", "D"]] = [fit.tc, fit.m, fit.w, fit.O, fit.D]
+        else:
+            res.loc[sym, "fit_error"] = err
+        if on_fit:
+            on_fit(sym, fit, err)
+    res["crit_date"] = [pd.Timestamp.fromordinal(int(tc)) if tc == tc and tc > 0 else pd.NaT for tc in res["tc"]]
+    res.index.name = "symbol"
+    return res
+
+
+def write_snapshot(res, path=SNAPSHOT_PATH):
+    path = os.fspath(path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    res.assign(scanned_at=pd.Timestamp.now()).to_parquet(tmp)
+    os.replace(tmp, path)
+
+
+def load_snapshot(path=SNAPSHOT_PATH):
+    """夜間スキャンの結果。無ければ空の DataFrame。"""
+    try:
+        return pd.read_parquet(path)
+    except (FileNotFoundError, OSError, ValueError):
+        return pd.DataFrame()
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="ダッシュボードの分析を一括で事前計算する")
+    p.add_argument("universe", help="銘柄リストのファイル")
+    p.add_argument("--start", default=START, help="履歴の開始日")
+    p.add_argument("--workers", type=int, default=os.cpu_count(), help="LPPLS の並列プロセス数")
+    p.add_argument("--fetch-workers", type=int, default=4, help="まとめて取得するバッチの並列スレッド数")
+    p.add_argument("--timeout", type=float, default=60, help="1 銘柄あたりのフィット制限時間 (秒)")
+    p.add_argument("--max-searches", type=int, default=20)
+    p.add_argument("--out", default=SNAPSHOT_PATH, help="出力先 Parquet")
+    args = p.parse_args(argv)
+    os.environ.setdefault("DRAGON_FIT_WORKERS", str(args.workers))  # このプロセス専用なのでプールも同じ大きさにする
+
+    symbols = read_universe(args.universe)
+    t0 = time.perf_counter()
+    frames = fetch_all(symbols, args.start, args.fetch_workers)
+    print(f"fetched {len(frames)}/{len(symbols)} symbols in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+    done = [0]
+
+    def progress(sym, fit, err):
+        done[0] += 1
+        if done[0] % 50 == 0 or done[0] == len(frames):
+            print(f"fitted {done[0]}/{len(frames)}", file=sys.stderr)
+
+    res = analyze(frames, args.workers, args.timeout, args.max_searches, on_fit=progress)
+    write_snapshot(res, args.out)
+    print(f"wrote {len(res)} rows to {args.out} in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import indicators
+import portfolio
+from quotes import fetch_quotes, value_portfolio
+
+# --- ベンチマーク ---
+# ネットワークを使わず、合成 (または保存済み) の価格系列で重い処理を計測する。
+# 結果は 1 行 1 計測の JSON で出すので、バージョン間で比較できる。
+#
+#   python bench.py --sizes 1 10 100 1000 > bench_output.txt
+
+SIZES = (1, 10, 100, 1000)
+BARS = 300
+
+
+def synthetic_frames(n, bars=BARS, seed=0):
+    """幾何ブラウン運動の終値を n 銘柄ぶん作る。"""
+    rng = np.random.default_rng(seed)
+    idx = pd.bdate_range("2025-01-01", periods=bars, name="Date")
+    r = rng.normal(0.0005, 0.02, size=(bars, n))
+    close = 100 * np.exp(np.cumsum(r, axis=0))
+    return {f"S{i:04d}": pd.DataFrame({"Close": close[:, i]}, index=idx) for i in range(n)}
+
+
+def recorded_frames(n):
+    """price_store に保存済みの系列を最大 n 本使う。"""
+    import price_store
+    out = {}
+    for p in sorted(price_store.OHLCV_DIR.glob("*.parquet"))[:n]:
+        out[p.stem] = pd.read_parquet(p)
+    return out
+
+
+def stub_provider(frames):
+    # yf.download の複数銘柄形式 (列: (Price, Ticker)) を返すスタブ
+    def provider(tickers, **kw):
+        tickers = [tickers] if isinstance(tickers, str) else tickers
+        close = pd.DataFrame({t: frames[t]["Close"].iloc[-5:] for t in tickers if t in frames})
+        return pd.concat({"Close": close}, axis=1)
+    return provider
+
+
+def timeit(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench_portfolio(frames):
+    syms = list(frames)
+    holdings = [{"銘柄": s, "単価": 100.0, "数量": 10.0} for s in syms]
+    provider = stub_provider(frames)
+    return lambda: value_portfolio(holdings, fetch_quotes(syms, provider=provider))
+
+
+def bench_fleet(frames):
+    holdings = [{"銘柄": s, "単価": 100.0, "数量": 10.0} for s in frames]
+    prices = indicators.panel(frames)
+    last = prices.iloc[-1] * 1.01
+
+    def run():
+        pf = portfolio.Portfolio(holdings).load(prices)
+        pf.update(last)
+        return pf.curve(), pf.corr(), pf.contribution(), pf.volatility()
+    return run
+
+
+def bench_indicators(frames):
+    prices = indicators.panel(frames)
+    return lambda: (indicators.summary(prices), indicators.rsi(prices))
+
+
+def bench_lppls(frames):
+    import lppls_engine
+    obs = [lppls_engine.observations(df) for df in frames.values()]
+    return lambda: [lppls_engine.fit_one(o, max_searches=20, seed=0) for o in obs]
+
+
+def bench_lppls_grid(frames):
+    import lppls_confidence
+    import lppls_engine
+    obs = [lppls_engine.observations(df) for df in frames.values()]
+
+    def fit():
+        for o in obs:
+            t2, span = o[0, -1], o[0, -1] - o[0, 0]
+            lppls_confidence.fit_grid(o[0], o[1], np.linspace(t2 - 0.05 * span, t2 + 0.2 * span, lppls_confidence.TC_STEPS))
+    return fit
+
+
+def bench_figures(frames):
+    import plotly.graph_objects as go
+
+    def build():
+        for df in frames.values():
+            fig = go.Figure(data=[go.Scatter(x=df.index, y=df['Close'])])
+            fig.to_json()
+    return build
+
+
+def bench_charts(frames):
+    import charts
+
+    def build():
+        charts.clear_cache()
+        for sym, df in frames.items():
+            charts.price_figure(sym, df).to_json()
+    return build
+
+
+STAGES = {
+    "portfolio": bench_portfolio,
+    "fleet": bench_fleet,
+    "indicators": bench_indicators,
+    "lppls_fit": bench_lppls,
+    "lppls_grid": bench_lppls_grid,
+    "figures": bench_figures,
+    "figures_charts": bench_charts,
+}
+
+
+def _version():
+    try:
+        # 計測の記録を見比べられるよう、どこから実行してもこのリポジトリの版を取る
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent).stdout.strip()
+    except OSError:
+        return None
+
+
+def run(sizes=SIZES, stages=tuple(STAGES), repeat=3, lppls_max=10, recorded=False, out=sys.stdout):
+    meta = {"version": _version(), "python": platform.python_version(), "machine": platform.machine()}
+    for n in sizes:
+        frames = recorded_frames(n) if recorded else synthetic_frames(n)
+        for stage in stages:
+            rec = dict(meta, stage=stage, n=len(frames))
+            if stage == "lppls_fit" and n > lppls_max:
+                rec["skipped"] = f"n > lppls_max ({lppls_max})"
+            else:
+                try:
+                    sec = timeit(STAGES[stage](frames), 1 if stage == "lppls_fit" else repeat)
+                    rec.update(seconds=sec, per_item=sec / max(len(frames), 1))
+                except ImportError as e:
+                    rec["skipped"] = str(e)
+            out.write(json.dumps(rec) + "\n")
+            out.flush()
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="取得・指標・LPPLS・チャート生成のベンチマーク")
+    p.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="銘柄数")
+    p.add_argument("--stages", nargs="+", default=list(STAGES), choices=list(STAGES))
+    p.add_argument("--repeat", type=int, default=3, help="各計測の繰り返し回数 (最良値を採る)")
+    p.add_argument("--lppls-max", type=int, default=10, help="フルの LPPLS フィット (lppls_fit) を計測する最大銘柄数")
+    p.add_argument("--recorded", action="store_true", help="合成データの代わりに保存済みの履歴を使う")
+    args = p.parse_args(argv)
+    run(args.sizes, args.stages, args.repeat, args.lppls_max, args.recorded)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# --- チャート生成 ---
+# 画面の横幅ぶん以上の点は送っても見えないので、LTTB (または min/max) で間引いてから描く。
+# 点が多いときは WebGL (Scattergl) を使い、作った Figure は (銘柄, 系列, テーマ) でキャッシュする。
+
+PIXEL_BUDGET = 1200        # 1 系列あたりに送る最大点数
+WEBGL_THRESHOLD = 5000     # 元の系列がこれを超える点数なら Scattergl
+CACHE_SIZE = 256
+
+THEMES = {
+    # app.py (Dragon King Theory)
+    "cyber": dict(
+        line=dict(color='#00f2ff', width=2),
+        layout=dict(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', height=220, margin=dict(l=0, r=0, t=0, b=0),
+                    font_color="#00f2ff", xaxis=dict(showgrid=False), yaxis=dict(showgrid=True, gridcolor='#112244')),
+    ),
+    # lair.py (Dragon King's Lair。diagnosis.py / like-dq.py も同じ)
+    "lair": dict(
+        line=dict(color='#ffffff', width=3),
+        layout=dict(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font=dict(family="DotGothic16", color="#ffffff")),
+    ),
+}
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def lttb(x, y, n):
+    """Largest-Triangle-Three-Buckets。形を保ったまま n 点に間引くインデックスを返す。"""
+    size = len(y)
+    if n >= size or n < 3:
+        return np.arange(size)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, size - 1, n - 1).astype(int)   # 先頭と末尾を除いた n-2 個のバケット
+    out = np.empty(n, dtype=int)
+    out[0], out[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # 次のバケットの平均点 (最後は末尾の点)
+        nlo, nhi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (size - 1, size)
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def minmax(y, n):
+    """各バケットの最小・最大だけを残す (スパイクを落とさない)。"""
+    size = len(y)
+    if n >= size or n < 4:
+        return np.arange(size)
+    y = np.asarray(y, dtype=float)
+    buckets = n // 2
+    usable = size // buckets * buckets
+    block = y[:usable].reshape(buckets, -1)
+    base = np.arange(buckets)[:, None] * block.shape[1]
+    idx = np.concatenate([base[:, 0] + block.argmin(axis=1), base[:, 0] + block.argmax(axis=1), np.arange(usable, size)])
+    return np.unique(idx)
+
+
+def downsample(x, y, budget=PIXEL_BUDGET, method="lttb"):
+    if budget is None or len(y) <= budget:
+        return x, y
+    xs = x.asi8 if hasattr(x, "asi8") else np.asarray(x, dtype=float)
+    idx = lttb(xs, y, budget) if method == "lttb" else minmax(y, budget)
+    return x[idx], np.asarray(y)[idx]
+
+
+def price_figure(symbol, df, theme="cyber", budget=PIXEL_BUDGET, method="lttb"):
+    """終値のラインチャート。同じ銘柄・同じ系列・テーマなら前回の Figure を返す。"""
+    close = df['Close']
+    values = close.to_numpy(dtype=float)
+    # 分割・配当で過去の値だけが調整し直されても別のキーになるよう、系列全体のハッシュも入れる
+    key = (symbol, len(close), close.index[-1] if len(close) else None,
+           hash(values.tobytes()), theme, budget, method)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    import plotly.graph_objects as go
+    x, y = downsample(close.index, values, budget, method)
+    style = THEMES[theme]
+    # 間引いた後は budget 点以下になるので、判定は間引く前の本数で行う
+    trace = go.Scattergl if len(close) > WEBGL_THRESHOLD else go.Scatter
+    fig = go.Figure(data=[trace(x=x, y=y, line=style["line"])])
+    fig.update_layout(**style["layout"])
+
+    with _cache_lock:
+        _cache[key] = fig
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return fig
@@ -0,0 +1,186 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from hashlib import sha1
+
+import perf
+from paths import CACHE_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows ではプロセス間ロックなし (プロセス内の集約だけ効く)
+    fcntl = None
+
+# --- 共有データプレーン ---
+# 同時に開いている複数のセッション・複数の Streamlit プロセスが同じ銘柄を取りに行っても、
+# 上流 (Yahoo) への問い合わせが 1 本で済むようにする。
+#   coalesce: 同じ key の取得はプロセス内はスレッド間で、プロセス間はファイルロックで 1 本にまとめる
+#   shared:   SQLite に置いたプロセス間キャッシュ + coalesce
+#   throttle: SQLite のトークンバケットによる全プロセス共通のレート制限
+
+RATE = 2.0      # 上流への 1 秒あたりの平均リクエスト数
+BURST = 8       # 一度に出せる最大リクエスト数
+LOCK_STRIPES = 64   # プロセス間ロックのファイル数。key はハッシュでこのどれかに割り当てる
+
+LOCK_DIR = CACHE_DIR / "locks"
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+_held = threading.local()   # このスレッドが持っているロックの番号 (入れ子で同じ番号に当たっても待たない)
+_lock_dir_ready = False
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = self.error = None
+
+
+def _key_str(key):
+    return key if isinstance(key, str) else repr(key)
+
+
+def _prepare_lock_dir():
+    # 以前の版が key ごとに作ったロックファイルを片付ける (プロセスごとに最初の 1 回だけ)
+    global _lock_dir_ready
+    LOCK_DIR.mkdir(parents=True, exist_ok=True)
+    for p in LOCK_DIR.glob("*.lock"):
+        if not p.name.startswith("stripe-"):
+            p.unlink(missing_ok=True)
+    _lock_dir_ready = True
+
+
+@contextmanager
+def _file_lock(key):
+    # key ごとにファイルを作ると日付入りの key で増え続けるので、決まった数のファイルを使い回す。
+    # 別の key が同じファイルに当たったときは順番待ちになるだけ
+    stripe = int.from_bytes(sha1(_key_str(key).encode()).digest()[:4], "big") % LOCK_STRIPES
+    held = getattr(_held, "stripes", None)
+    if held is None:
+        held = _held.stripes = set()
+    if fcntl is None or stripe in held:
+        yield
+        return
+    if not _lock_dir_ready:
+        _prepare_lock_dir()
+    with open(LOCK_DIR / f"stripe-{stripe:02d}.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        held.add(stripe)
+        try:
+            yield
+        finally:
+            held.discard(stripe)
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def coalesce(key, fn):
+    """同じ key で実行中の取得があれば、その結果を待って共有する。"""
+    with _inflight_lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+    if not leader:
+        perf.count("dataplane.coalesced")
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.value
+    try:
+        with _file_lock(key):
+            call.value = fn()
+        return call.value
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+        call.done.set()
+
+
+def _connect():
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(CACHE_DIR / "dataplane.sqlite", timeout=10, isolation_level=None)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("CREATE TABLE IF NOT EXISTS shared (key TEXT PRIMARY KEY, value BLOB, stored_at REAL)")
+    con.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+    return con
+
+
+def _get(key, ttl):
+    try:
+        with closing(_connect()) as con:
+            row = con.execute("SELECT value FROM shared WHERE key = ? AND stored_at > ?",
+                              (_key_str(key), time.time() - ttl)).fetchone()
+        return pickle.loads(row[0]) if row else None
+    except (sqlite3.Error, pickle.UnpicklingError):
+        return None
+
+
+def _put(key, value):
+    try:
+        with closing(_connect()) as con:
+            con.execute("INSERT OR REPLACE INTO shared VALUES (?, ?, ?)",
+                        (_key_str(key), pickle.dumps(value), time.time()))
+    except sqlite3.Error:
+        pass
+
+
+def shared(key, fn, ttl):
+    """プロセス間で共有するキャッシュ。期限切れなら 1 本だけが fn を実行する。"""
+    hit = _get(key, ttl)
+    if hit is not None:
+        perf.count("dataplane.hit")
+        return hit
+
+    def load():
+        hit = _get(key, ttl)  # ロック待ちの間に他のプロセスが入れていればそれを使う
+        if hit is not None:
+            perf.count("dataplane.hit")
+            return hit
+        perf.count("dataplane.miss")
+        value = fn()
+        _put(key, value)
+        return value
+
+    return coalesce(key, load)
+
+
+def _take(name, rate, burst):
+    # トークンを 1 つ取る。足りなければ待つべき秒数を返す
+    with closing(_connect()) as con:
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            row = con.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+            now = time.time()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if wait == 0.0:
+                tokens -= 1
+            con.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (name, tokens, now))
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+    return wait
+
+
+def throttle(name="yahoo", rate=None, burst=None):
+    """全プロセス共通のレート制限。上流を呼ぶ直前に通す。"""
+    rate = rate or float(os.environ.get("DRAGON_RATE", RATE))
+    burst = burst or BURST
+    while True:
+        try:
+            wait = _take(name, rate, burst)
+        except sqlite3.Error:
+            return
+        if wait <= 0:
+            return
+        perf.count("dataplane.throttled")
+        time.sleep(wait)
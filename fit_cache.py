@@ -0,0 +1,78 @@
+import hashlib
+import json
+import sqlite3
+import time
+from contextlib import closing
+
+import numpy as np
+
+import perf
+from paths import CACHE_DIR
+
+# --- LPPLS フィット結果のキャッシュ ---
+# 観測配列 (序数日, log 価格) とフィット条件のハッシュをキーに SQLite へ保存する。
+# 価格が変わっていなければ再フィットせずに前回の tc, m, w, ... を返す。
+
+DB_PATH = CACHE_DIR / "lppls_fits.sqlite"
+MAX_ENTRIES = 5000
+
+
+def _connect():
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(DB_PATH, timeout=10)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("CREATE TABLE IF NOT EXISTS fits (key TEXT PRIMARY KEY, value TEXT, last_used REAL)")
+    con.execute("CREATE TABLE IF NOT EXISTS last_fits (symbol TEXT PRIMARY KEY, value TEXT, n INTEGER)")
+    return con
+
+
+def make_key(obs, **params):
+    h = hashlib.sha1(np.ascontiguousarray(obs, dtype=float).tobytes())
+    h.update(json.dumps(params, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def get(key):
+    try:
+        with closing(_connect()) as con, con:
+            row = con.execute("SELECT value FROM fits WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                perf.count("fit_cache.miss")
+                return None
+            con.execute("UPDATE fits SET last_used = ? WHERE key = ?", (time.time(), key))
+        perf.count("fit_cache.hit")
+        return json.loads(row[0])
+    except sqlite3.Error:
+        return None
+
+
+def put(key, values, max_entries=MAX_ENTRIES):
+    try:
+        with closing(_connect()) as con, con:
+            con.execute("INSERT OR REPLACE INTO fits VALUES (?, ?, ?)",
+                        (key, json.dumps([float(v) for v in values]), time.time()))
+            # 最近使われていないものから削る (LRU)
+            con.execute("DELETE FROM fits WHERE key IN (SELECT key FROM fits ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                        (max_entries,))
+    except sqlite3.Error:
+        pass
+
+
+# --- 銘柄ごとの直近の解 (ウォームスタート用) ---
+
+def get_last(symbol):
+    try:
+        with closing(_connect()) as con:
+            row = con.execute("SELECT value, n FROM last_fits WHERE symbol = ?", (symbol,)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+    except sqlite3.Error:
+        return None
+
+
+def put_last(symbol, values, n):
+    try:
+        with closing(_connect()) as con, con:
+            con.execute("INSERT OR REPLACE INTO last_fits VALUES (?, ?, ?)",
+                        (symbol, json.dumps([float(v) for v in values]), int(n)))
+    except sqlite3.Error:
+        pass
@@ -0,0 +1,207 @@
+import math
+from array import array
+
+import numpy as np
+import pandas as pd
+
+# --- テクニカル指標 (日付 × 銘柄 の価格パネルを NumPy で一括計算) ---
+# 市場ごとに休場日が違うので、列ごとに欠損を上に寄せて (compact) から計算し、
+# 銘柄を 1 本ずつ pandas で処理したときと同じ値を返す。
+# last=True のときは表示に使う最終値だけを計算する。
+
+
+def panel(frames, column="Close"):
+    """{銘柄: OHLCV DataFrame} から 1 列ずつ並べた価格パネルを作る。"""
+    return pd.DataFrame({sym: df[column] for sym, df in frames.items()}).sort_index()
+
+
+def _as_panel(prices):
+    if isinstance(prices, pd.Series):
+        return prices.to_frame(prices.name or "Close")
+    return prices
+
+
+def _compact(a):
+    # 各列の有効値を下 (最新側) に詰める。安定ソートなので順序は保たれる
+    order = np.argsort(~np.isnan(a), axis=0, kind="stable")
+    return np.take_along_axis(a, order, axis=0), order
+
+
+def _expand(res, order):
+    out = np.empty_like(res)
+    np.put_along_axis(out, order, res, axis=0)
+    return out
+
+
+def _rolling_mean(a, window):
+    n, k = a.shape
+    out = np.full((n, k), np.nan)
+    if n < window:
+        return out
+    valid = ~np.isnan(a)
+    cs = np.vstack([np.zeros((1, k)), np.cumsum(np.where(valid, a, 0.0), axis=0)])
+    cn = np.vstack([np.zeros((1, k)), np.cumsum(valid, axis=0)])
+    s, c = cs[window:] - cs[:-window], cn[window:] - cn[:-window]
+    out[window - 1:] = np.where(c == window, s / window, np.nan)
+    return out
+
+
+def _gains_losses(a):
+    d = np.diff(a, axis=0, prepend=np.nan)
+    # pandas の delta.where(delta > 0, 0) と同じく先頭の差分は 0 扱い、価格が無い行だけ欠損
+    gain = np.where(np.isnan(a), np.nan, np.where(d > 0, d, 0.0))
+    loss = np.where(np.isnan(a), np.nan, np.where(d < 0, -d, 0.0))
+    return gain, loss
+
+
+def _rsi(gain_mean, loss_mean):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100 - 100 / (1 + gain_mean / loss_mean)
+
+
+def _wrap(prices, values, last):
+    if last:
+        return pd.Series(values, index=prices.columns)
+    return pd.DataFrame(values, index=prices.index, columns=prices.columns)
+
+
+def sma(prices, window=25, last=False):
+    prices = _as_panel(prices)
+    a, order = _compact(prices.to_numpy(dtype=float))
+    if last:
+        tail = a[-window:]
+        return _wrap(prices, tail.mean(axis=0) if len(tail) == window else np.full(a.shape[1], np.nan), True)
+    return _wrap(prices, _expand(_rolling_mean(a, window), order), False)
+
+
+def rsi(prices, window=14, last=False):
+    prices = _as_panel(prices)
+    a, order = _compact(prices.to_numpy(dtype=float))
+    if last:
+        a = a[-(window + 1):]
+    gain, loss = _gains_losses(a)
+    if last:
+        g, l = gain[-window:], loss[-window:]
+        if len(g) < window:
+            return _wrap(prices, np.full(a.shape[1], np.nan), True)
+        return _wrap(prices, _rsi(g.mean(axis=0), l.mean(axis=0)), True)
+    return _wrap(prices, _expand(_rsi(_rolling_mean(gain, window), _rolling_mean(loss, window)), order), False)
+
+
+def deviation(prices, window=25, last=False):
+    """移動平均からの乖離率 (%)。移動平均は 1 回だけ計算する。"""
+    prices = _as_panel(prices)
+    ma = sma(prices, window, last)
+    if last:
+        a, _ = _compact(prices.to_numpy(dtype=float))
+        return (pd.Series(a[-1], index=prices.columns) - ma) / ma * 100
+    return (prices - ma) / ma * 100
+
+
+def volatility(prices, window=20, last=False, periods=252):
+    """対数リターンの標準偏差 (年率換算)。"""
+    prices = _as_panel(prices)
+    a, order = _compact(prices.to_numpy(dtype=float))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = np.diff(np.log(a), axis=0, prepend=np.nan)
+    if last:
+        tail = r[-window:]
+        v = tail.std(axis=0, ddof=1) if len(tail) == window else np.full(a.shape[1], np.nan)
+        return _wrap(prices, v * np.sqrt(periods), True)
+    m = _rolling_mean(r, window)
+    m2 = _rolling_mean(r * r, window)
+    var = np.clip(m2 - m * m, 0, None) * window / (window - 1)
+    return _wrap(prices, _expand(np.sqrt(var) * np.sqrt(periods), order), False)
+
+
+def summary(prices):
+    """ダッシュボード表示用の最終値だけをまとめて返す (行: 銘柄)。"""
+    prices = _as_panel(prices)
+    a, _ = _compact(prices.to_numpy(dtype=float))
+    return pd.DataFrame({
+        "close": a[-1] if len(a) else np.nan,
+        "rsi": rsi(prices, last=True),
+        "sma25": sma(prices, 25, last=True),
+        "deviation": deviation(prices, 25, last=True),
+        "volatility": volatility(prices, last=True),
+    }, index=prices.columns)
+
+
+# --- ストリーミング版 (1 バーごとに O(1) で更新) ---
+# ライブのティックから HP バーやメトリクスを動かすための軽量な状態。
+# リングバッファと累積和だけを持ち、過去の履歴は再計算しない。
+
+class StreamingIndicators:
+    __slots__ = ("rsi_window", "sma_window", "last", "last_ts",
+                 "_gains", "_losses", "_closes", "_gsum", "_lsum", "_csum", "_n", "_prev", "_prev_ts")
+
+    RESUM_EVERY = 1024  # 浮動小数の誤差が溜まらないよう、たまに累積和を取り直す
+    REWRITE_TOLERANCE = 1e-4  # 確定済みのバーの値がこれ以上変わっていたら履歴ごと調整し直されたとみなす
+
+    def __init__(self, rsi_window=14, sma_window=25):
+        self.rsi_window, self.sma_window = rsi_window, sma_window
+        self._gains = array("d", [0.0]) * rsi_window
+        self._losses = array("d", [0.0]) * rsi_window
+        self._closes = array("d", [0.0]) * sma_window
+        self._gsum = self._lsum = self._csum = 0.0
+        self._n = 0
+        self._prev = self.last = math.nan
+        self.last_ts = self._prev_ts = None
+
+    def _set(self, n, close, prev):
+        # n 番目のバーの寄与をバッファに書き込み、累積和を差分更新する
+        d = 0.0 if n == 0 else close - prev
+        i, j = n % self.rsi_window, n % self.sma_window
+        g, l = max(d, 0.0), max(-d, 0.0)
+        self._gsum += g - self._gains[i]
+        self._lsum += l - self._losses[i]
+        self._csum += close - self._closes[j]
+        self._gains[i], self._losses[i], self._closes[j] = g, l, close
+
+    def update(self, close, ts=None):
+        """新しいバーを 1 本追加する。ts が最終バーと同じなら確定前の値として差し替える。"""
+        close = float(close)
+        if ts is not None and self.last_ts is not None and ts <= self.last_ts:
+            if ts == self.last_ts and self._n:
+                self._set(self._n - 1, close, self._prev)
+                self.last = close
+            return self
+        self._set(self._n, close, self.last)
+        self._prev, self.last = self.last, close
+        self._n += 1
+        self._prev_ts, self.last_ts = self.last_ts, ts
+        if self._n % self.RESUM_EVERY == 0:
+            self._gsum, self._lsum, self._csum = math.fsum(self._gains), math.fsum(self._losses), math.fsum(self._closes)
+        return self
+
+    def sync(self, series):
+        """Series のうちまだ見ていないバー (と最終バーの更新) だけを流し込む。
+
+        1 本前の確定済みのバーの値が変わっていれば (分割・配当で履歴が調整し直された)、最初から作り直す。
+        """
+        if self._prev_ts is not None and self._prev_ts in series.index:
+            seen = float(series.at[self._prev_ts])
+            if seen == seen and not math.isclose(seen, self._prev, rel_tol=self.REWRITE_TOLERANCE):
+                self.__init__(self.rsi_window, self.sma_window)
+        if self.last_ts is not None:
+            series = series[series.index >= self.last_ts]
+        for ts, v in series.dropna().items():
+            self.update(v, ts)
+        return self
+
+    @property
+    def rsi(self):
+        if self._n < self.rsi_window:
+            return math.nan
+        g, l = max(self._gsum, 0.0), max(self._lsum, 0.0)
+        if l == 0:
+            return 100.0 if g > 0 else math.nan
+        return 100 - 100 / (1 + g / l)
+
+    @property
+    def sma(self):
+        return self._csum / self.sma_window if self._n >= self.sma_window else math.nan
+
+    @property
+    def deviation(self):
+        return (self.last - self.sma) / self.sma * 100
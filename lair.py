@@ -0,0 +1,321 @@
+import sys
+from functools import partial
+
+import pandas as pd
+import streamlit as st
+
+import charts
+import indicators
+import metadata
+import perf
+import refresher
+import price_store
+
+# --- Dragon King's Lair (共通本体) ---
+# diagnosis.py と like-dq.py は見た目だけが違う同じ画面なので、ここに 1 本化してテーマで切り替える。
+#   streamlit run lair.py -- --theme dq      (または URL に ?theme=dq)
+#   streamlit run diagnosis.py / like-dq.py  (従来どおり。中身は main(テーマ) を呼ぶだけ)
+# 重いライブラリは画面の起動時には読まない。plotly はチャートを作るとき charts.price_figure の中で読み込む。
+
+START = "2025-06-01"   # 日足・週足の表示開始日 (分足・時間足は price_store.INTERVALS の既定期間)
+
+# --- CSS：ラベル文字の白色化とスタイル調整 ---
+CLASSIC_CSS = """
+    <style>
+    @import url('https://fonts.googleapis.com/css2?family=DotGothic16&display=swap');
+
+    /* 1. 全体背景 */
+    .stApp { background-color: #000000 !important; font-family: 'DotGothic16', sans-serif !important; }
+
+    /* 2. サイドバー：レンガ背景 */
+    [data-testid="stSidebar"] {
+        background-color: #4a2c2a !important; 
+        background-image: 
+            linear-gradient(335deg, #2e1a18 23px, transparent 23px),
+            linear-gradient(155deg, #2e1a18 23px, transparent 23px),
+            linear-gradient(335deg, #2e1a18 23px, transparent 23px),
+            linear-gradient(155deg, #2e1a18 23px, transparent 23px);
+        background-size: 58px 58px;
+        background-position: 0px 2px, 4px 35px, 29px 31px, 34px 6px;
+        border-right: 5px solid #ffffff !important;
+    }
+
+    /* 3. サイドバーテキスト */
+    [data-testid="stSidebar"] h3, [data-testid="stSidebar"] p, [data-testid="stSidebar"] span {
+        color: #ffffff !important;
+        text-shadow: 2px 2px 0px #000000 !important;
+    }
+
+    /* 4. 銘柄名・属性ウィンドウ */
+    .name-window {
+        background-color: #000000 !important;
+        border: 4px solid #ffffff !important;
+        padding: 15px !important;
+        margin-top: 15px !important;
+        color: #ffffff !important;
+        text-align: center !important;
+    }
+    .sector-tag {
+        color: #ffff00 !important;
+        font-size: 0.9rem !important;
+        margin-top: 5px;
+    }
+
+    /* 5. HPバー（RSI視覚化） */
+    .hp-label { color: #ffffff; font-size: 1.2rem; margin-bottom: 5px; }
+    .hp-container {
+        width: 100%;
+        background-color: #333;
+        border: 4px solid #fff;
+        height: 30px;
+        margin-bottom: 10px;
+    }
+    .hp-fill { height: 100%; transition: width 0.5s ease-in-out; }
+
+    /* 6. ★ メトリクス（ステータス）のラベルを白く強制する ★ */
+    [data-testid="stMetricLabel"] p {
+        color: #ffffff !important;
+        font-size: 1.1rem !important;
+    }
+    [data-testid="stMetric"] {
+        background-color: #000000 !important;
+        border: 4px solid #ffffff !important;
+    }
+    [data-testid="stMetricValue"] { 
+        color: #ffff00 !important; 
+        text-shadow: 2px 2px #ff0000; 
+    }
+
+    /* 7. レポート・入力欄 */
+    div[data-baseweb="input"] { background-color: #000000 !important; border: 4px solid #ffffff !important; }
+    input { color: #ffffff !important; background-color: #000000 !important; }
+    .report-card { background-color: #000000 !important; border: 4px solid #ffffff !important; padding: 20px !important; color: #ffffff !important; }
+    h1, h2, h3 { color: #ffffff !important; border-bottom: 2px solid #ffffff; }
+    </style>
+    """
+
+# --- CSS：古のコマンドウィンドウとドラクエ風ロゴ ---
+DQ_CSS = """
+    <style>
+    @import url('https://fonts.googleapis.com/css2?family=DotGothic16&display=swap');
+
+    /* 全体背景 */
+    .stApp { background-color: #000000 !important; font-family: 'DotGothic16', sans-serif !important; }
+
+    /* ★ ドラクエ風コマンドロゴ ★ */
+    .dq-logo {
+        background: linear-gradient(180deg, #0000bb 0%, #000055 100%);
+        border: 4px solid #ffffff;
+        border-radius: 10px;
+        padding: 10px 20px;
+        display: inline-block;
+        margin-bottom: 20px;
+        box-shadow: 0 0 0 2px #000000, 0 0 0 4px #ffffff;
+    }
+    .dq-logo-text {
+        color: #ffffff !important;
+        font-size: 2.2rem !important;
+        font-weight: bold;
+        text-shadow: 2px 2px #000000;
+        letter-spacing: 2px;
+    }
+
+    /* サイドバー：レンガ背景 */
+    [data-testid="stSidebar"] {
+        background-color: #4a2c2a !important; 
+        background-image: 
+            linear-gradient(335deg, #2e1a18 23px, transparent 23px),
+            linear-gradient(155deg, #2e1a18 23px, transparent 23px),
+            linear-gradient(335deg, #2e1a18 23px, transparent 23px),
+            linear-gradient(155deg, #2e1a18 23px, transparent 23px);
+        background-size: 58px 58px;
+        background-position: 0px 2px, 4px 35px, 29px 31px, 34px 6px;
+        border-right: 5px solid #ffffff !important;
+    }
+
+    /* サイドバーテキスト */
+    [data-testid="stSidebar"] h3, [data-testid="stSidebar"] p, [data-testid="stSidebar"] span {
+        color: #ffffff !important;
+        text-shadow: 2px 2px 0px #000000 !important;
+    }
+
+    /* 銘柄名ウィンドウ（コマンド風） */
+    .name-window {
+        background-color: #000000 !important;
+        border: 4px solid #ffffff !important;
+        padding: 15px !important;
+        margin-top: 15px !important;
+        color: #ffffff !important;
+    }
+
+    /* HPバー（RSI視覚化） */
+    .hp-label { color: #ffffff; font-size: 1.2rem; margin-top: 15px; }
+    .hp-container {
+        width: 100%;
+        background-color: #333;
+        border: 3px solid #fff;
+        height: 25px;
+    }
+    .hp-fill { height: 100%; transition: width 0.5s ease-in-out; }
+
+    /* メトリクス（ステータス） */
+    [data-testid="stMetricLabel"] p { color: #ffffff !important; }
+    [data-testid="stMetric"] {
+        background-color: #000000 !important;
+        border: 4px solid #ffffff !important;
+    }
+    [data-testid="stMetricValue"] { color: #ffff00 !important; text-shadow: 2px 2px #ff0000; }
+
+    /* レポートカード */
+    .report-card { background-color: #000000 !important; border: 4px solid #ffffff !important; padding: 20px !important; color: #ffffff !important; }
+    h1, h2, h3 { color: #ffffff !important; border-bottom: 2px solid #ffffff; }
+    </style>
+    """
+
+THEMES = {
+    # diagnosis.py
+    "classic": dict(
+        css=CLASSIC_CSS,
+        header='<h1>▶ DRAGON KING\'S LAIR</h1>',
+        name_window='''
+        <div class="name-window">
+            <div style="font-size: 1.3rem;">▶ {name}</div>
+            <div class="sector-tag">【 属性: {sector} 】</div>
+        </div>
+    ''',
+        unknown=("不明な属性", "未知の属性"),
+        hp_size="1.2rem",
+    ),
+    # like-dq.py
+    "dq": dict(
+        css=DQ_CSS,
+        header='''
+    <div class="dq-logo">
+        <span class="dq-logo-text">▶ DRAGON KING'S LAIR</span>
+    </div>
+''',
+        name_window='''
+        <div class="name-window">
+            <div style="font-size: 1.2rem;">▶ {name}</div>
+            <div style="color: #ffff00; font-size: 0.9rem; margin-top: 5px;">【 属性: {sector} 】</div>
+        </div>
+    ''',
+        unknown=("不明", "未知"),
+        hp_size="1.1rem",
+    ),
+}
+DEFAULT_THEME = "classic"
+
+
+def requested_theme():
+    """URL の ?theme= か、コマンドラインの --theme で指定されたテーマ名。"""
+    theme = st.query_params.get("theme")
+    if theme is None and "--theme" in sys.argv[:-1]:
+        theme = sys.argv[sys.argv.index("--theme") + 1]
+    return theme if theme in THEMES else DEFAULT_THEME
+
+
+def get_stock_info(snap, symbol, unknown=THEMES[DEFAULT_THEME]["unknown"]):
+    """metadata のスナップショットを (名前, 属性) にする。一度も取れていなければ ？？？？。"""
+    if snap is None:
+        return "……", "よみこみちゅう"
+    if snap.value is None:
+        return "？？？？", unknown[1]
+    info = snap.value
+    return metadata.display_name(info, symbol), info.get('sector') or info.get('quoteType') or unknown[0]
+
+
+def load_data(symbol, interval="1d"):
+    snap = refresher.shared().read(("bars", symbol, interval, START),
+                                   partial(price_store.load_bars, symbol, interval, START, ["Close"]), wait=5,
+                                   interval=60 if price_store.is_intraday(interval) else None)
+    if snap is None or snap.value is None:
+        return pd.DataFrame(), snap
+    return snap.value[['Close']].dropna(), snap
+
+
+def main(theme=None):
+    style = THEMES[theme or requested_theme()]
+
+    # --- ページ設定 ---
+    st.set_page_config(page_title="Dragon King's Lair", layout="wide")
+    run = perf.start_run("lair")
+
+    st.markdown(style["css"], unsafe_allow_html=True)
+    st.markdown(style["header"], unsafe_allow_html=True)
+
+    # --- サイドバー：入力と属性表示 ---
+    with st.sidebar:
+        st.markdown("<h3>[ コマンド ]</h3>", unsafe_allow_html=True)
+        ticker_input = st.text_input("しらべる 銘柄コード:", value="XRP-USD").upper()
+        ticker = ticker_input.strip()
+        interval = st.selectbox("あし の ながさ:", list(price_store.INTERVALS), index=3)
+
+        # 取得は refresher がバックグラウンドで行い、画面はスナップショットを読むだけ。
+        # 取得の失敗は refresher に任せ (前回の値を出しつつすぐ取り直す)、表示の代わりの文字はここで決める
+        stock_name, stock_sector = ("なし", "無")
+        if ticker:
+            with perf.span("info", ticker):
+                info_snap = refresher.shared().read(("info", ticker), partial(metadata.get, ticker),
+                                                    wait=2, interval=6 * 3600)
+            stock_name, stock_sector = get_stock_info(info_snap, ticker, style["unknown"])
+
+        st.write("▼ いまの あいて")
+        st.markdown(style["name_window"].format(name=stock_name, sector=stock_sector), unsafe_allow_html=True)
+        show_perf = st.checkbox("しょりじかん を みる", value=False)
+        perf_box = st.empty()
+
+    # --- 診断ロジック ---
+    if ticker:
+        with perf.span("fetch", ticker):
+            df, data_snap = load_data(ticker, interval)
+        if not df.empty and len(df) > 30:
+            # 銘柄・足ごとの状態をセッションに持ち、新しいバーだけを足す
+            live = st.session_state.setdefault("live_ind", {})
+            with perf.span("indicators", ticker):
+                ind = live.setdefault((ticker, interval), indicators.StreamingIndicators()).sync(df['Close'])
+            rsi_val = ind.rsi
+
+            # HPバーの色決定
+            hp_color = "#00ff00"
+            if rsi_val > 70: hp_color = "#ff0000"
+            elif rsi_val < 30: hp_color = "#ffff00"
+
+            # --- メイン画面：ステータス ---
+            st.markdown(f"<h3>{ticker} の ステータス</h3>", unsafe_allow_html=True)
+            col1, col2, col3 = st.columns(3)
+            col1.metric("かかく (G)", f"{df['Close'].iloc[-1]:,.2f}")
+            col2.metric("きりょく (RSI)", f"{rsi_val:.1f}")
+            col3.metric("かいり (DIV)", f"{ind.deviation:.1f}")
+
+            # --- レポート ---
+            st.markdown('<div class="report-card">', unsafe_allow_html=True)
+            st.write(f"▼ {stock_name} を しらべた！")
+            if rsi_val > 70: st.write("・てきは こうふんしている！")
+            elif rsi_val < 30: st.write("・てきは つかれている！")
+            else: st.write("・てきは おちついている。")
+            st.markdown('</div>', unsafe_allow_html=True)
+
+            # --- チャート ---
+            with perf.span("chart", ticker):
+                st.plotly_chart(charts.price_figure(f"{ticker}@{interval}", df, "lair"), use_container_width=True)
+            st.caption(f"DATA @ {refresher.freshness(data_snap)}")
+
+            # --- HPバー（グラフ下） ---
+            st.markdown(f'''
+                <div class="hp-label">▶ てきの きりょく (HP)</div>
+                <div class="hp-container">
+                    <div class="hp-fill" style="width: {rsi_val}%; background-color: {hp_color};"></div>
+                </div>
+                <div style="text-align:right; font-size: {style["hp_size"]}; color: #ffffff;">{rsi_val:.1f} / 100</div>
+            ''', unsafe_allow_html=True)
+        else:
+            st.write("▼ お返事がない。 ただの しかばね の ようだ。")
+            st.caption(f"DATA @ {refresher.freshness(data_snap)}")
+
+    if show_perf:
+        perf.render(perf_box.container(), run)
+
+
+if __name__ == "__main__":
+    main()
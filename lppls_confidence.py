@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+import lppls_engine
+
+# --- LPPLS 信頼度インジケータ ---
+# 終点 t2 ごとに長さの違う窓を何本もフィットし、条件を満たすフィットの割合を信頼度とする。
+# 非線形パラメータ (tc, m, w) は格子で全候補を並べ、線形部分 (A, B, C1, C2) は
+# 候補ぶんの 4x4 正規方程式をまとめて解く。ループは窓と終点だけで、中身はすべて配列演算。
+
+M_GRID = np.linspace(0.1, 0.9, 9)
+W_GRID = np.linspace(6.0, 13.0, 8)
+TC_STEPS = 20
+
+# 条件 (Sornette 系の文献で一般的な値)
+TC_RANGE = (-0.05, 0.10)   # 窓の長さに対する tc - t2 の許容範囲
+MIN_OSCILLATIONS = 2.5
+MIN_DAMPING = 0.5
+
+
+def fit_grid(t, p, tc_grid, m_grid=M_GRID, w_grid=W_GRID):
+    """全 (tc, m, w) 候補の線形最小二乗を一括で解き、誤差最小の解を返す。"""
+    dt = np.abs(tc_grid[:, None] - t[None, :]) + 1e-9          # (Ktc, n)
+    ldt = np.log(dt)
+    f = dt[None, :, :] ** m_grid[:, None, None]                 # (Km, Ktc, n)
+    cos = np.cos(w_grid[:, None, None] * ldt[None])             # (Kw, Ktc, n)
+    sin = np.sin(w_grid[:, None, None] * ldt[None])
+    f = np.broadcast_to(f[:, None], (len(m_grid), len(w_grid)) + dt.shape)
+    g = f * cos[None]
+    h = f * sin[None]
+    n = len(t)
+    X = np.stack([np.ones_like(f), f, g, h], axis=-1).reshape(-1, n, 4)   # (K, n, 4)
+    XtX = np.einsum("kni,knj->kij", X, X) + np.eye(4) * 1e-10
+    Xty = np.einsum("kni,n->ki", X, p)
+    beta = np.linalg.solve(XtX, Xty[..., None])[..., 0]
+    sse = p @ p - np.einsum("ki,ki->k", beta, Xty)              # 最適解での残差平方和
+    k = int(np.nanargmin(sse))
+    im, iw, itc = np.unravel_index(k, (len(m_grid), len(w_grid), len(tc_grid)))
+    a, b, c1, c2 = beta[k]
+    return tc_grid[itc], m_grid[im], w_grid[iw], a, b, c1, c2, max(sse[k], 0.0)
+
+
+def qualifies(t1, t2, tc, m, w, b, c1, c2):
+    """条件を満たすなら +1 (上昇バブル: B<0) / -1 (下落: B>0)、満たさなければ 0。"""
+    span = t2 - t1
+    if not (t2 + TC_RANGE[0] * span <= tc <= t2 + TC_RANGE[1] * span):
+        return 0
+    c = np.hypot(c1, c2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        o = w / (2 * np.pi) * np.log(abs((tc - t1) / (tc - t2)))
+        d = m * abs(b) / (w * c)
+    if not (o >= MIN_OSCILLATIONS and d >= MIN_DAMPING):
+        return 0
+    return 1 if b < 0 else -1
+
+
+def confidence_at(obs, end, windows):
+    """obs[:, :end] を終点に、長さ windows の各窓をフィットして (上昇, 下落) の信頼度を返す。"""
+    flags = []
+    for n in windows:
+        t, p = obs[0, end - n:end], obs[1, end - n:end]
+        t1, t2 = t[0], t[-1]
+        span = t2 - t1
+        # 条件の範囲より少し先まで探し、外に出た解は不合格として数える
+        tc_grid = np.linspace(t2 + TC_RANGE[0] * span, t2 + TC_RANGE[1] * span * 2, TC_STEPS)
+        tc, m, w, a, b, c1, c2, _ = fit_grid(t, p, tc_grid)
+        flags.append(qualifies(t1, t2, tc, m, w, b, c1, c2))
+    flags = np.array(flags)
+    return float(np.mean(flags > 0)), float(np.mean(flags < 0))
+
+
+def _one(args):
+    return confidence_at(*args)
+
+
+def signal(obs_map, min_window=30, max_window=250, window_step=20, workers=None):
+    """{銘柄: obs} の最新バー時点の信頼度だけをまとめて出す (スクリーナー用の軽い版)。"""
+    syms = [s for s, obs in obs_map.items() if obs.shape[1] >= min_window]
+    if not syms:
+        return pd.DataFrame(columns=["pos_conf", "neg_conf"])
+    tasks = []
+    for s in syms:
+        n = obs_map[s].shape[1]
+        tasks.append((obs_map[s], n, list(range(min(max_window, n), min_window - 1, -window_step))))
+    res = list(lppls_engine.imap(_one, tasks, workers))
+    return pd.DataFrame(res, index=pd.Index(syms, name="symbol"), columns=["pos_conf", "neg_conf"])
+
+
+def confidence(df, points=60, min_window=30, max_window=250, window_step=5, workers=None):
+    """終値から信頼度の時系列 (直近 points 本ぶん) を作る。列は pos_conf / neg_conf。"""
+    obs = lppls_engine.observations(df)
+    n = obs.shape[1]
+    ends = list(range(max(min_window, n - points + 1), n + 1))
+    if not ends:
+        return pd.DataFrame(columns=["pos_conf", "neg_conf"])
+    tasks = []
+    for end in ends:
+        windows = list(range(min(max_window, end), min_window - 1, -window_step))
+        tasks.append((obs, end, windows))
+    res = list(lppls_engine.imap(_one, tasks, workers))
+    idx = df['Close'].dropna().index[[e - 1 for e in ends]]
+    return pd.DataFrame(res, index=idx, columns=["pos_conf", "neg_conf"])
@@ -0,0 +1,234 @@
+import multiprocessing
+import os
+import random
+import signal
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+import fit_cache
+
+# --- LPPLS スキャンエンジン ---
+# 銘柄ごと（必要なら探索シードごと）にプロセスプールへ投げ、終わった順に結果を返す。
+# プールはプロセス内の全セッションで 1 つを共有し、大きさは最初に作るときに決めたら変えない
+# (DRAGON_FIT_WORKERS か CPU 数)。各呼び出しの workers は「同時に投げる数」の上限として扱う。
+
+Fit = namedtuple("Fit", "tc m w a b c c1 c2 O D sse")
+
+WARM_STEPS = 200        # ウォームスタート時の Nelder-Mead 反復上限
+WARM_TOLERANCE = 1.10   # 前回より RMSE が 1 割以上悪化したらフルサーチに戻す
+TIMEOUT_GRACE = 5.0     # 子プロセスの制限時間が効かなかったときに親が打ち切るまでの猶予 (秒)
+
+EPOCH_ORDINAL = pd.Timestamp("1970-01-01").toordinal()
+NS_PER_DAY = pd.Timedelta(days=1).value
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def observations(df):
+    """終値の DataFrame から lppls 用の (序数日, log 価格) 配列を作る。
+
+    時刻は日の端数として持つので、日中足でも足ごとに別の時刻になる (日足なら従来の序数日と同じ値)。
+    """
+    close = df['Close'].dropna()
+    ns = np.asarray(close.index, dtype="datetime64[ns]").view("i8")
+    time_ = ns / NS_PER_DAY + EPOCH_ORDINAL
+    return np.array([time_, np.log(close.to_numpy(dtype=float).flatten())])
+
+
+def to_timestamp(t):
+    """observations の時刻 (tc など) を Timestamp に戻す。"""
+    return pd.Timestamp(int((t - EPOCH_ORDINAL) * NS_PER_DAY))
+
+
+def sse(obs, tc, m, w, a, b, c1, c2):
+    dt = np.abs(tc - obs[0])
+    fit = a + dt ** m * (b + c1 * np.cos(w * np.log(dt)) + c2 * np.sin(w * np.log(dt)))
+    return float(np.nansum((fit - obs[1]) ** 2))
+
+
+def refine(obs, prev, steps=WARM_STEPS):
+    """前回の (tc, m, w) を初期値に局所探索だけ行う。発散したら None。"""
+    from lppls import lppls
+    from scipy.optimize import minimize
+    model = lppls.LPPLS(observations=obs)
+    res = minimize(model.func_restricted, x0=np.array(prev[:3], dtype=float), args=(obs,),
+                   method="Nelder-Mead", options={"maxiter": steps})
+    tc, m, w = res.x
+    t1, t2 = obs[0, 0], obs[0, -1]
+    if not (np.isfinite(res.fun) and 0 < m < 1 and w > 0 and t1 < tc <= t2 + (t2 - t1) * 0.5):
+        return None
+    a, b, c1, c2 = model.matrix_equation(obs, tc, m, w)[:, 0].tolist()
+    c = model.get_c(c1, c2)
+    return Fit(tc, m, w, a, b, c, c1, c2, model.get_oscillations(w, tc, t1, t2),
+               model.get_damping(m, w, b, c), sse(obs, tc, m, w, a, b, c1, c2))
+
+
+def fit_one(obs, max_searches=20, seed=None, prev=None):
+    from lppls import lppls
+    if prev is not None:
+        # prev = (前回の Fit の値, 前回の観測数)。精度が保てていればそのまま採用
+        values, n = prev
+        try:
+            warm = refine(obs, values)
+        except Exception:
+            warm = None
+        if warm is not None and np.sqrt(warm.sse / obs.shape[1]) <= np.sqrt(values[-1] / n) * WARM_TOLERANCE:
+            return warm
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+    tc, m, w, a, b, c, c1, c2, O, D = lppls.LPPLS(observations=obs).fit(max_searches=max_searches)
+    if tc == 0:
+        return None
+    return Fit(tc, m, w, a, b, c, c1, c2, O, D, sse(obs, tc, m, w, a, b, c1, c2))
+
+
+class FitTimeout(BaseException):
+    # lppls や refine の except Exception に握りつぶされないよう BaseException にする
+    pass
+
+
+def _alarm(signum, frame):
+    raise FitTimeout()
+
+
+def _timed(timeout, fn, *args):
+    """ワーカーの中で制限時間を掛けて fn を実行する。
+
+    時間は実際に動き始めてから数えるので、前のフィットの待ち時間は含まれない。
+    時間切れでも例外で抜けるだけなので、ワーカーはそのまま次のフィットに使える。
+    SIGALRM の無い環境 (Windows) では親側の打ち切りだけになる。
+    """
+    if not timeout or not hasattr(signal, "setitimer"):
+        return fn(*args)
+    old = signal.signal(signal.SIGALRM, _alarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return fn(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, old)
+
+
+def pool_size():
+    return int(os.environ.get("DRAGON_FIT_WORKERS") or os.cpu_count() or 1)
+
+
+def get_pool():
+    """LPPLS 系の重い計算で共有するプロセスプール。
+
+    他のセッションのフィットが載っているので、縮めたり止めたりはしない。
+    ワーカーが落ちて使えなくなったときだけ作り直す。
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or getattr(_pool, "_broken", False):
+            # Streamlit はスレッド上で動くので fork ではなく spawn で起こす
+            _pool = ProcessPoolExecutor(max_workers=pool_size(), mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def imap(fn, items, workers=None):
+    """共有プールで fn(item) を実行し、items の順に結果を返す。同時に投げるのは workers 件まで。"""
+    pool = get_pool()
+    cap = max(1, workers or pool_size())
+    futs = deque()
+    for item in items:
+        futs.append(pool.submit(fn, item))
+        if len(futs) >= cap:
+            yield futs.popleft().result()
+    while futs:
+        yield futs.popleft().result()
+
+
+def scan(obs_map, max_searches=20, workers=None, timeout=60, seeds=1, cache=True, warm=True):
+    """{銘柄: obs} を並列にフィットし、(銘柄, Fit or None, エラー文字列) を終わった順に yield する。
+
+    seeds > 1 なら max_searches を分割して別シードで同時に探索し、誤差最小の解を採る。
+    同じ観測・同じ条件のフィットは fit_cache から即座に返す。
+    warm=True なら前回の解がある銘柄は局所探索 1 本だけ投げ、駄目なときだけフルサーチする。
+    """
+    keys = {sym: fit_cache.make_key(obs, max_searches=max_searches, seeds=seeds) for sym, obs in obs_map.items()}
+    if cache:
+        obs_map = dict(obs_map)
+        for sym, key in keys.items():
+            hit = fit_cache.get(key)
+            if hit is not None:
+                del obs_map[sym]
+                yield sym, Fit(*hit), None
+    if not obs_map:
+        return
+    workers = max(1, workers or pool_size())
+    pool = get_pool()
+    per_seed = max(1, max_searches // seeds)
+
+    # 共有プールを 1 つのセッションで埋めないよう、手元で列を持って workers 件ずつ投げる
+    queue = deque()
+    left = {}
+    for sym, obs in obs_map.items():
+        prev = fit_cache.get_last(sym) if warm else None
+        if prev is not None:
+            queue.append((sym, (obs, max_searches, None, prev)))
+            left[sym] = 1
+            continue
+        for k in range(seeds):
+            queue.append((sym, (obs, per_seed, None if seeds == 1 else k)))
+        left[sym] = seeds
+    futs = {}
+    best = {sym: None for sym in obs_map}
+    errors = {sym: None for sym in obs_map}
+    started = {}
+    pending = set()
+
+    def submit():
+        while queue and len(pending) < workers:
+            sym, args = queue.popleft()
+            f = pool.submit(_timed, timeout, fit_one, *args)
+            futs[f] = sym
+            pending.add(f)
+
+    def finish(f, fit=None, err=None):
+        sym = futs[f]
+        left[sym] -= 1
+        if fit is not None and (best[sym] is None or fit.sse < best[sym].sse):
+            best[sym] = fit
+        if err:
+            errors[sym] = err
+        if left[sym] == 0:
+            if best[sym] is not None:
+                if cache:
+                    fit_cache.put(keys[sym], best[sym])
+                fit_cache.put_last(sym, best[sym], obs_map[sym].shape[1])
+            return sym, best[sym], None if best[sym] else errors[sym] or "NO FIT"
+
+    submit()
+    while pending:
+        done, not_done = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+        pending.intersection_update(not_done)
+        for f in done:
+            try:
+                out = finish(f, fit=f.result())
+            except FitTimeout:
+                out = finish(f, err="TIMEOUT")
+            except Exception as e:
+                out = finish(f, err=type(e).__name__)
+            if out:
+                yield out
+        # 時間切れは子プロセスが自分で判定する。ここは子の制限が効かなかったとき (C の中で止まっている、
+        # SIGALRM が無い) の保険。running() は実行待ちの列に入った時点で立つので、前の 1 本ぶんの待ちを見込む
+        now = time.monotonic()
+        for f in list(pending):
+            if f.running():
+                started.setdefault(f, now)
+            if f in started and now - started[f] > 2 * timeout + TIMEOUT_GRACE:
+                pending.discard(f)
+                out = finish(f, err="TIMEOUT")
+                if out:
+                    yield out
+        submit()
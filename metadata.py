@@ -0,0 +1,118 @@
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+import dataplane
+import perf
+import refresher
+from paths import CACHE_DIR
+
+# --- 銘柄メタデータ (名前・属性・配当利回り) ---
+# yf.Ticker(...).info は遅いので、使う項目だけを抜き出して SQLite に長期保存する。
+
+DB_PATH = CACHE_DIR / "metadata.sqlite"
+FIELDS = ("longName", "shortName", "sector", "quoteType", "dividendYield")
+TTL = 7 * 24 * 3600
+
+_warmed = set()
+_warm_lock = threading.Lock()
+
+
+def _default_fetch(symbol):
+    import yfinance as yf
+    dataplane.throttle()
+    return yf.Ticker(symbol).info
+
+
+def _connect():
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(DB_PATH, timeout=10)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("CREATE TABLE IF NOT EXISTS meta (symbol TEXT PRIMARY KEY, value TEXT, fetched_at REAL)")
+    return con
+
+
+def cached(symbols, ttl=TTL):
+    """キャッシュにある (期限内の) ものだけを {銘柄: dict} で返す。"""
+    symbols = list(symbols)
+    if not symbols:
+        return {}
+    try:
+        with closing(_connect()) as con:
+            rows = con.execute(
+                f"SELECT symbol, value FROM meta WHERE fetched_at > ? AND symbol IN ({','.join('?' * len(symbols))})",
+                (time.time() - ttl, *symbols)).fetchall()
+        return {sym: json.loads(v) for sym, v in rows}
+    except sqlite3.Error:
+        return {}
+
+
+def _store(symbol, info):
+    meta = {k: info.get(k) for k in FIELDS}
+    try:
+        with closing(_connect()) as con, con:
+            con.execute("INSERT OR REPLACE INTO meta VALUES (?, ?, ?)", (symbol, json.dumps(meta), time.time()))
+    except sqlite3.Error:
+        pass
+    return meta
+
+
+def _load(symbol, fetch, ttl):
+    # 同じ銘柄の .info 取得は get・prefetch・warm のどこからでもプロセス内外で 1 本にまとめる
+    def run():
+        hit = cached([symbol], ttl).get(symbol)  # ロック待ちの間に他が取得済みならそれを使う
+        if hit is not None:
+            return hit
+        return _store(symbol, (fetch or _default_fetch)(symbol))
+    return dataplane.coalesce(("meta", symbol), run)
+
+
+def get(symbol, fetch=None, ttl=TTL):
+    hit = cached([symbol], ttl).get(symbol)
+    if hit is not None:
+        return hit
+    return _load(symbol, fetch, ttl)
+
+
+def prefetch(symbols, fetch=None, workers=8, ttl=TTL, strict=False):
+    """キャッシュに無い銘柄だけをまとめて並列取得し、全銘柄分の dict を返す。
+
+    strict なら取れなかった銘柄があるとき、取れた分を持たせて refresher.Partial を投げる
+    (refresher から呼ぶとき。失敗を成功として長い間隔で寝かせないように)。
+    """
+    symbols = list(dict.fromkeys(s for s in symbols if s))
+    out = cached(symbols, ttl)
+    missing = [s for s in symbols if s not in out]
+    perf.count("metadata.hit", len(out))
+    perf.count("metadata.miss", len(missing))
+
+    def one(sym):
+        try:
+            return sym, _load(sym, fetch, ttl)
+        except Exception as e:
+            perf.error("meta", e, sym)
+            return sym, None
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(workers, len(missing))) as ex:
+            out.update((sym, meta) for sym, meta in ex.map(one, missing) if meta is not None)
+    failed = [s for s in missing if s not in out]
+    if strict and failed:
+        raise refresher.Partial(out, f"no metadata for {', '.join(failed)}")
+    return out
+
+
+def warm(symbols):
+    """まだ温めていない銘柄があれば、裏のスレッドで prefetch しておく。"""
+    with _warm_lock:
+        todo = [s for s in symbols if s and s not in _warmed]
+        _warmed.update(todo)
+    if todo:
+        threading.Thread(target=prefetch, args=(todo,), name="metadata-warm", daemon=True).start()
+
+
+def display_name(meta, symbol):
+    return meta.get("longName") or meta.get("shortName") or symbol
@@ -0,0 +1,8 @@
+import os
+from pathlib import Path
+
+# --- 保存先 ---
+# 価格履歴・各種 SQLite キャッシュ・ロックファイルを置くディレクトリ (環境変数 DRAGON_CACHE_DIR で変えられる)。
+# どのモジュールからも読むだけなので、他のモジュールには依存しない。
+
+CACHE_DIR = Path(os.environ.get("DRAGON_CACHE_DIR", Path(__file__).resolve().parent / ".cache"))
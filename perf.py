@@ -0,0 +1,136 @@
+import json
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ContextDecorator
+
+# --- 計測 ---
+# 1 回の画面描画 (run) ごとに、処理区間 (span) とカウンタを記録する。
+#   with perf.span("fetch", ticker="AAPL"): ...
+#   @perf.span("indicators")
+#   perf.count("fit_cache.hit")
+# run の外 (バックグラウンドスレッド等) で記録されたものはプロセス全体の記録に入る。
+
+MAX_ERRORS = 200   # run ごとに残す握りつぶした例外の数 (プロセス全体の記録が増え続けないように)
+
+
+class Run:
+    def __init__(self, name="run"):
+        self.name = name
+        self.started = time.time()
+        self.spans = []          # (name, ticker, 秒)
+        self.counters = Counter()
+        self.errors = deque(maxlen=MAX_ERRORS)   # (区間, 銘柄, メッセージ)
+        self._lock = threading.Lock()
+
+    def add_span(self, name, ticker, seconds):
+        with self._lock:
+            self.spans.append((name, ticker, seconds))
+
+    def add(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def counts(self):
+        with self._lock:
+            return Counter(self.counters)
+
+    def recent_errors(self):
+        with self._lock:
+            return list(self.errors)
+
+    def slowest(self, top=10):
+        return sorted(self.spans, key=lambda s: s[2], reverse=True)[:top]
+
+    def totals(self):
+        out = Counter()
+        for name, _, sec in self.spans:
+            out[name] += sec
+        return out
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "started": self.started,
+            "spans": [{"name": n, "ticker": t, "seconds": s} for n, t, s in self.spans],
+            "counters": dict(self.counts()),
+            "errors": [{"stage": s, "ticker": t, "message": m} for s, t, m in self.recent_errors()],
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    def to_prometheus(self):
+        lines = ["# TYPE dashboard_span_seconds gauge"]
+        for name, ticker, sec in self.spans:
+            label = f'stage="{name}"' + (f',ticker="{ticker}"' if ticker else "")
+            lines.append(f"dashboard_span_seconds{{{label}}} {sec:.6f}")
+        lines.append("# TYPE dashboard_events_total counter")
+        for name, n in sorted(self.counts().items()):
+            lines.append(f'dashboard_events_total{{event="{name}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+
+_local = threading.local()
+process = Run("process")
+
+
+def start_run(name="run"):
+    _local.run = Run(name)
+    return _local.run
+
+
+def current():
+    return getattr(_local, "run", None) or process
+
+
+class span(ContextDecorator):
+    def __init__(self, name, ticker=None):
+        self.name, self.ticker = name, ticker
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        current().add_span(self.name, self.ticker, time.perf_counter() - self._t0)
+        return False
+
+    def _recreate_cm(self):
+        # デコレータとして使うと同じインスタンスが毎回呼ばれるので、呼び出しごとに作り直して開始時刻を分ける
+        return span(self.name, self.ticker)
+
+
+def count(name, n=1):
+    current().add(name, n)
+
+
+def error(stage, exc, ticker=None):
+    """握りつぶした例外を数え、内容も残しておく。"""
+    run = current()
+    run.add(f"error.{stage}")
+    with run._lock:
+        run.errors.append((stage, ticker, f"{type(exc).__name__}: {exc}"))
+
+
+def render(container, run, top=10):
+    """サイドバー等に、遅い区間・区間別合計・カウンタと書き出しボタンを出す。"""
+    import pandas as pd
+    container.markdown("**SLOWEST SPANS**")
+    container.dataframe(pd.DataFrame(run.slowest(top), columns=["stage", "ticker", "sec"]), hide_index=True)
+    totals = run.totals()
+    container.markdown("**STAGE TOTALS**")
+    container.dataframe(pd.DataFrame(sorted(totals.items(), key=lambda kv: -kv[1]), columns=["stage", "sec"]), hide_index=True)
+    # この描画のぶんと、バックグラウンドを含むプロセス起動からの累計は別の表にする
+    records = [("THIS RUN", run)] + ([("PROCESS", process)] if run is not process else [])
+    for label, rec in records:
+        counters = rec.counts()
+        if counters:
+            container.markdown(f"**COUNTERS ({label})**")
+            container.dataframe(pd.DataFrame(sorted(counters.items()), columns=["event", "n"]), hide_index=True)
+        errors = rec.recent_errors()
+        if errors:
+            container.markdown(f"**SWALLOWED ERRORS ({label})**")
+            container.dataframe(pd.DataFrame(errors, columns=["stage", "ticker", "message"]), hide_index=True)
+    container.download_button("JSON", run.to_json(), file_name="perf.json", mime="application/json")
+    container.download_button("PROMETHEUS", run.to_prometheus(), file_name="perf.prom", mime="text/plain")
@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+
+# --- ポートフォリオ分析 ---
+# 保有銘柄の終値を (日付 × 銘柄) の 1 枚の行列に揃え、評価額の推移・ドローダウン・ボラティリティ・
+# 相関/共分散・銘柄ごとの寄与を行列演算でまとめて出す。
+# 日次リターンは和と積和 (Σr, ΣrrT) で持つので、最新バーの修正や新しいバーの追加は
+# 全期間を計算し直さずに 1 行ぶんの更新で済む。
+
+TRADING_DAYS = 252               # 期間が短くて本数から年率を出せないときの既定値
+HISTORY_YEARS = 3
+MIN_SPAN_DAYS = 90
+
+
+def history_start(years=HISTORY_YEARS):
+    return (pd.Timestamp.now().normalize() - pd.DateOffset(years=years)).strftime("%Y-%m-%d")
+
+
+def holdings_frame(data_list):
+    """保有リスト (銘柄 / 単価 / 数量) を銘柄ごとに 1 行へまとめる。単価は数量で加重平均する。"""
+    pf = pd.DataFrame(data_list, columns=["銘柄", "単価", "数量"])
+    pf = pf[pf["数量"] > 0]
+    pf = pf.assign(取得額=pf["単価"] * pf["数量"]).groupby("銘柄", sort=False)[["取得額", "数量"]].sum()
+    pf["単価"] = pf["取得額"] / pf["数量"]
+    return pf[["単価", "数量"]]
+
+
+class Portfolio:
+    """保有銘柄の価格行列と、その上の統計量。"""
+
+    def __init__(self, data_list):
+        pf = holdings_frame(data_list)
+        self.symbols = list(pf.index)
+        self.cost = pf["単価"].to_numpy(dtype=float)
+        self.qty = pf["数量"].to_numpy(dtype=float)
+        self.index = pd.DatetimeIndex([], name="Date")
+        self.prices = np.empty((0, len(self.symbols)))
+        self.equity = np.empty(0)
+        self.peak = np.empty(0)
+        self._n = 0
+        self._s1 = np.zeros(len(self.symbols))
+        self._s2 = np.zeros((len(self.symbols), len(self.symbols)))
+
+    def load(self, prices):
+        """価格パネル (indicators.panel の形) から全期間を計算し直す。
+
+        保有銘柄のどれかに値がある日だけを残し、休場日の違いは直前の値で埋め、
+        全銘柄の価格がそろった日から始める。履歴が無い銘柄は symbols から外れる。
+        """
+        p = prices.reindex(columns=self.symbols)
+        p = p[p.notna().any(axis=1)].ffill()
+        keep = p.notna().any(axis=0).to_numpy()
+        if not keep.all():
+            self.symbols = [s for s, k in zip(self.symbols, keep) if k]
+            self.cost, self.qty = self.cost[keep], self.qty[keep]
+        p = p.loc[:, keep].dropna()
+        self.index = pd.DatetimeIndex(p.index, name="Date")
+        self.prices = np.array(p.to_numpy(dtype=float))  # update で書き換えるので複製して持つ
+        self.equity = self.prices @ self.qty
+        self.peak = np.maximum.accumulate(self.equity)
+        r = self._returns(self.prices)
+        self._n = len(r)
+        self._s1 = r.sum(axis=0)
+        self._s2 = r.T @ r
+        return self
+
+    @staticmethod
+    def _returns(prices):
+        return prices[1:] / prices[:-1] - 1
+
+    def update(self, last, ts=None):
+        """最新の価格 ({銘柄: 価格} か Series) を反映する。
+
+        ts が無いか最終バーと同じなら最終バーを書き換え、より新しければ 1 行追加する。
+        どちらも最後の 1 行ぶんの和と積和を差し替えるだけで済む。
+        """
+        if not len(self.index):
+            return self
+        p = pd.Series(last, dtype=float).reindex(self.symbols).to_numpy()
+        if ts is not None and pd.Timestamp(ts) > self.index[-1]:
+            p = np.where(np.isnan(p), self.prices[-1], p)
+            self.index = self.index.append(pd.DatetimeIndex([pd.Timestamp(ts)], name="Date"))
+            self.prices = np.vstack([self.prices, p])
+            self.equity = np.append(self.equity, p @ self.qty)
+            self.peak = np.append(self.peak, max(self.peak[-1], self.equity[-1]))
+            self._add_last(1.0)
+            return self
+        if ts is not None and pd.Timestamp(ts) < self.index[-1]:
+            return self
+        p = np.where(np.isnan(p), self.prices[-1], p)
+        if len(self.index) > 1:
+            self._add_last(-1.0)
+        self.prices[-1] = p
+        self.equity[-1] = p @ self.qty
+        self.peak[-1] = max(self.peak[-2], self.equity[-1]) if len(self.peak) > 1 else self.equity[-1]
+        if len(self.index) > 1:
+            self._add_last(1.0)
+        return self
+
+    def _add_last(self, sign):
+        r = self._returns(self.prices[-2:])[0]
+        self._n += int(sign)
+        self._s1 += sign * r
+        self._s2 += sign * np.outer(r, r)
+
+    # --- 統計量 ---
+
+    def drawdown(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.equity / self.peak - 1
+
+    def curve(self):
+        """評価額の推移とドローダウンの表。"""
+        return pd.DataFrame({"評価額": self.equity, "ドローダウン": self.drawdown()}, index=self.index)
+
+    def max_drawdown(self):
+        return float(np.nanmin(self.drawdown())) if len(self.equity) else np.nan
+
+    def periods_per_year(self):
+        """1 年あたりのバーの本数。
+
+        暗号資産を持つと週末も直前の値で埋めた行ができるので、252 に固定せず実際の本数から出す
+        (株だけなら約 250、暗号資産を含めば約 365)。
+        """
+        span = (self.index[-1] - self.index[0]).days if len(self.index) > 1 else 0
+        if span < MIN_SPAN_DAYS:
+            return TRADING_DAYS
+        return (len(self.index) - 1) / span * 365.25
+
+    def cov(self):
+        """日次リターンの共分散行列 (年率)。"""
+        n = self._n
+        if n < 2:
+            return pd.DataFrame(np.nan, index=self.symbols, columns=self.symbols)
+        c = (self._s2 - np.outer(self._s1, self._s1) / n) / (n - 1) * self.periods_per_year()
+        return pd.DataFrame(c, index=self.symbols, columns=self.symbols)
+
+    def corr(self):
+        c = self.cov().to_numpy()
+        sd = np.sqrt(np.diag(c))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return pd.DataFrame(c / np.outer(sd, sd), index=self.symbols, columns=self.symbols)
+
+    def weights(self):
+        value = self.prices[-1] * self.qty if len(self.index) else np.zeros(len(self.symbols))
+        total = value.sum()
+        return value / total if total else value
+
+    def volatility(self):
+        """ポートフォリオ全体の年率ボラティリティ (現在の評価額の比率で加重)。"""
+        w = self.weights()
+        return float(np.sqrt(w @ self.cov().to_numpy() @ w))
+
+    def contribution(self):
+        """銘柄ごとの評価額・損益・期間中の寄与・ボラティリティ・リスク寄与。"""
+        if not len(self.index):
+            return pd.DataFrame(columns=["評価額", "比率", "損益", "期間寄与", "ボラティリティ", "リスク寄与"])
+        c = self.cov().to_numpy()
+        w = self.weights()
+        last, first = self.prices[-1], self.prices[0]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            risk = w * (c @ w) / (w @ c @ w)
+        return pd.DataFrame({
+            "評価額": last * self.qty,
+            "比率": w,
+            "損益": (last - self.cost) * self.qty,
+            # 期間の始めの総評価額に対して、その銘柄の値動きが何割ぶん効いたか (合計すると期間リターン)
+            "期間寄与": (last - first) * self.qty / self.equity[0],
+            "ボラティリティ": np.sqrt(np.diag(c)),
+            "リスク寄与": risk,
+        }, index=pd.Index(self.symbols, name="銘柄"))
@@ -0,0 +1,471 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+import dataplane
+import perf
+from paths import CACHE_DIR
+
+# --- 価格履歴のローカル保存 ---
+# 日足は銘柄ごとに Parquet 1 ファイル、1 分足は銘柄ごとのディレクトリに 1 日 1 ファイルで持つ。
+# 再起動・複数ワーカー・3 つのダッシュボードで同じファイルを共有する。
+# 5 分足・1 時間足は 1 分足から、週足は日足から、読むたびにまとめ直す (別々には取りに行かない)。
+
+OHLCV_DIR = CACHE_DIR / "ohlcv"
+COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+REFRESH_AFTER = 15 * 60          # この秒数以内に更新済みならネットに行かない
+MAX_BYTES = 512 * 1024 * 1024    # 保存領域の上限
+MAX_AGE = 30 * 24 * 3600         # 最後に使われてからこの秒数で削除
+ADJUST_TOLERANCE = 1e-4          # 取り直した確定済みバーの終値がこれ以上ずれていたら調整し直しとみなす
+
+INTRADAY = "1m"
+INTRADAY_DIR = OHLCV_DIR / INTRADAY
+INTRADAY_REFRESH_AFTER = 60      # 1 分足はこの秒数で取り直す
+INTRADAY_MAX_DAYS = 29           # Yahoo は 1 分足を直近 30 日ぶんしか返さない
+INTRADAY_REQUEST_DAYS = 7        # 1 回のリクエストで取れる 1 分足の日数
+
+# 表示する足 -> (保存している元の足, まとめる幅, 既定の表示期間)
+# 分足・時間足の表示期間は、バーのある日 (取引のあった日) の数として数える
+INTERVALS = {
+    "1m": (INTRADAY, None, pd.Timedelta(days=1)),
+    "5m": (INTRADAY, pd.Timedelta(minutes=5), pd.Timedelta(days=5)),
+    "1h": (INTRADAY, pd.Timedelta(hours=1), pd.Timedelta(days=INTRADAY_MAX_DAYS)),
+    "1d": ("1d", None, pd.Timedelta(days=365)),
+    "1wk": ("1d", pd.Timedelta(weeks=1), pd.Timedelta(weeks=156)),
+}
+AGG = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+ORIGIN = pd.Timestamp("1970-01-05").value    # 月曜 0:00。週足は月曜始まり (yfinance と同じ)
+SESSION_SLACK = pd.Timedelta(days=4)          # 週末・連休をまたいでも表示期間ぶんの取引日が読めるよう余分に読む
+
+
+BATCH = 100                      # load_many で 1 回の yf.download にまとめる銘柄数
+
+
+def _default_fetch(symbol, start, interval="1d", end=None):
+    import yfinance as yf
+    dataplane.throttle()
+    return yf.download(symbol, start=start, end=end, interval=interval, progress=False)
+
+
+def _default_fetch_many(symbols, start):
+    import yfinance as yf
+    dataplane.throttle()
+    return yf.download(symbols, start=start, group_by="ticker", progress=False)
+
+
+def _path(symbol):
+    return OHLCV_DIR / f"{quote(symbol, safe='')}.parquet"
+
+
+def _normalize(data):
+    if data is None or len(data) == 0:
+        return pd.DataFrame(columns=COLUMNS, index=pd.DatetimeIndex([], name="Date"), dtype=float)
+    data = data.copy()
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+    data = data[[c for c in COLUMNS if c in data.columns]].dropna(subset=["Close"])
+    idx = pd.DatetimeIndex(data.index)
+    if idx.tz is not None:
+        idx = idx.tz_localize(None)
+    data.index = idx.rename("Date")
+    return data.astype(float)
+
+
+def read(symbol):
+    p = _path(symbol)
+    try:
+        df = pd.read_parquet(p)
+        os.utime(p, (time.time(), p.stat().st_mtime))  # atime を「最後に使った時刻」として残す
+        return df
+    except (FileNotFoundError, OSError, ValueError):
+        return None
+
+
+def _write(p, df):
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_suffix(f".{os.getpid()}.tmp")
+    df.to_parquet(tmp)
+    os.replace(tmp, p)  # 他プロセスからは常に完全なファイルだけが見える
+
+
+def _start_path(symbol):
+    return _path(symbol).with_suffix(".start")
+
+
+def requested_start(symbol):
+    """保存済みの日足を取ったときに指定した開始日 (記録が無ければ None)。"""
+    try:
+        return pd.Timestamp(_start_path(symbol).read_text().strip())
+    except (FileNotFoundError, OSError, ValueError):
+        return None
+
+
+def write(symbol, df, start=None):
+    """日足を保存する。start から取り直した全期間なら、その開始日も横に書き残す。"""
+    _write(_path(symbol), df)
+    if start is not None:
+        p = _start_path(symbol)
+        tmp = p.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(f"{pd.Timestamp(start):%Y-%m-%d}")
+        os.replace(tmp, p)
+
+
+def _covers(stored, start, requested=None):
+    # 開始日が休日でも取り直さないよう 1 週間の余裕を見る。
+    # 上場が start より新しい銘柄は最初のバーが後ろにずれるので、start 以前から取った記録があれば足りているとみなす
+    if stored is None or stored.empty:
+        return False
+    return stored.index[0] <= start + pd.Timedelta(days=7) or (requested is not None and requested <= start)
+
+
+def _origin(stored, requested):
+    # 保存済みの全期間を取り直すときの開始日
+    return stored.index[0] if requested is None else min(stored.index[0], requested)
+
+
+def _since(stored):
+    # 最終バーは確定前の可能性があるので、その日から取り直して上書きする。
+    # 1 本前の確定済みのバーも取り、_consistent で保存済みの値と比べる
+    return stored.index[-2] if len(stored) > 1 else stored.index[-1]
+
+
+def _consistent(stored, delta):
+    """取り直したバーが保存済みの確定済みバーと一致するか。
+
+    yfinance の値は分割・配当で過去にさかのぼって調整し直されるので、
+    一致しなければ差分をつなぐと段差ができる (全期間を取り直す)。
+    """
+    common = stored.index.intersection(delta.index)[:-1]
+    if not len(common):
+        return True
+    return np.allclose(delta.loc[common, "Close"].to_numpy(), stored.loc[common, "Close"].to_numpy(),
+                       rtol=ADJUST_TOLERANCE, atol=0)
+
+
+def _fresh(symbol, start, refresh_after):
+    stored = read(symbol)
+    if (_covers(stored, start, requested_start(symbol))
+            and time.time() - _path(symbol).stat().st_mtime < refresh_after):
+        perf.count("price_store.hit")
+        return stored
+    return None
+
+
+def load_history(symbol, start, fetch=None, refresh_after=REFRESH_AFTER):
+    """start 以降の OHLCV を返す。保存済みなら最終バー以降の差分だけ取りに行く。"""
+    start = pd.Timestamp(start)
+    df = _fresh(symbol, start, refresh_after)
+    if df is None:
+        # 同じ (銘柄, 期間) の更新はプロセス内外で 1 本にまとめる
+        df = dataplane.coalesce(("ohlcv", symbol, str(start.date())),
+                                lambda: _update(symbol, start, fetch or _default_fetch, refresh_after))
+    return df[df.index >= start]
+
+
+def _update(symbol, start, fetch, refresh_after):
+    df = _fresh(symbol, start, refresh_after)  # ロック待ちの間に他のプロセスが更新済みならそれを使う
+    if df is not None:
+        return df
+    stored, requested = read(symbol), requested_start(symbol)
+    if not _covers(stored, start, requested):
+        perf.count("price_store.miss")
+        df = _normalize(fetch(symbol, start))
+        if not df.empty:
+            write(symbol, df, start)
+            evict()
+    else:
+        perf.count("price_store.delta")
+        delta = _normalize(fetch(symbol, _since(stored)))
+        if _consistent(stored, delta):
+            df = pd.concat([stored, delta])
+            df = df[~df.index.duplicated(keep="last")].sort_index()
+            write(symbol, df)
+        else:
+            perf.count("price_store.readjust")
+            since = min(start, _origin(stored, requested))
+            df = _normalize(fetch(symbol, since))
+            if df.empty:
+                return stored
+            write(symbol, df, since)
+    return df
+
+# --- 1 分足 (1 日 1 ファイル) ---
+
+def _day_dir(symbol):
+    return INTRADAY_DIR / quote(symbol, safe='')
+
+
+def _days(symbol):
+    # ファイル名は YYYY-MM-DD なので文字列の並びがそのまま日付順
+    return sorted(_day_dir(symbol).glob("*.parquet"))
+
+
+def read_window(symbol, start, end=None, columns=None):
+    """1 分足のうち [start, end) に掛かる日のファイルだけを、columns の列だけ読む。"""
+    start = pd.Timestamp(start)
+    lo, hi = f"{start:%Y-%m-%d}", f"{pd.Timestamp(end):%Y-%m-%d}" if end is not None else "9999"
+    frames = []
+    for p in _days(symbol):
+        if lo <= p.stem <= hi:
+            try:
+                frames.append(pd.read_parquet(p, columns=columns))
+                os.utime(p, (time.time(), p.stat().st_mtime))
+            except (FileNotFoundError, OSError, ValueError):
+                pass
+    df = pd.concat(frames) if frames else _normalize(None)[columns or COLUMNS]
+    keep = df.index >= start
+    if end is not None:
+        keep &= df.index < pd.Timestamp(end)
+    return df[keep]
+
+
+def write_days(symbol, df):
+    """1 分足を日ごとに分けて、その日のファイルを丸ごと置き換える。"""
+    ns = _ns(df.index)
+    day = ns // pd.Timedelta(days=1).value
+    cuts = np.flatnonzero(np.diff(day)) + 1
+    for lo, hi in zip(np.r_[0, cuts], np.r_[cuts, len(df)]):
+        if hi > lo:
+            _write(_day_dir(symbol) / f"{df.index[lo]:%Y-%m-%d}.parquet", df.iloc[lo:hi])
+
+
+def _intraday_fresh(symbol, start, refresh_after):
+    days = _days(symbol)
+    # 開始日が休日でもよいように 3 日の余裕を見る
+    if days and days[0].stem <= f"{start + pd.Timedelta(days=3):%Y-%m-%d}" \
+            and time.time() - days[-1].stat().st_mtime < refresh_after:
+        perf.count("price_store.hit")
+        return True
+    return False
+
+
+def _fetch_intraday(fetch, symbol, start):
+    # 1 分足は 1 回で 7 日ぶんまでなので、期間を区切って取る
+    frames = []
+    s, end = start.normalize(), pd.Timestamp.now().normalize() + pd.Timedelta(days=1)
+    while s < end:
+        e = min(s + pd.Timedelta(days=INTRADAY_REQUEST_DAYS), end)
+        frames.append(_normalize(fetch(symbol, s, interval=INTRADAY, end=e)))
+        s = e
+    df = pd.concat(frames)
+    return df[~df.index.duplicated(keep="last")].sort_index()
+
+
+def load_intraday(symbol, start, fetch=None, refresh_after=INTRADAY_REFRESH_AFTER, columns=None):
+    """start 以降の 1 分足を返す。保存済みなら最後の日から先だけ取りに行く。"""
+    start = max(pd.Timestamp(start), pd.Timestamp.now().normalize() - pd.Timedelta(days=INTRADAY_MAX_DAYS))
+    if not _intraday_fresh(symbol, start, refresh_after):
+        dataplane.coalesce(("ohlcv", symbol, INTRADAY, str(start.date())),
+                           lambda: _update_intraday(symbol, start, fetch or _default_fetch, refresh_after))
+    return read_window(symbol, start, columns=columns)
+
+
+def _update_intraday(symbol, start, fetch, refresh_after):
+    if _intraday_fresh(symbol, start, refresh_after):
+        return
+    days = _days(symbol)
+    if days and days[0].stem <= f"{start + pd.Timedelta(days=3):%Y-%m-%d}":
+        # 最後の日は途中までしか入っていないので、その日の頭から取り直す
+        perf.count("price_store.delta")
+        last = pd.Timestamp(days[-1].stem)
+        df = _fetch_intraday(fetch, symbol, last)
+        if not _consistent(read_window(symbol, last), df):
+            perf.count("price_store.readjust")
+            df = _fetch_intraday(fetch, symbol, start)
+    else:
+        perf.count("price_store.miss")
+        df = _fetch_intraday(fetch, symbol, start)
+    if not df.empty:
+        write_days(symbol, df)
+        evict()
+
+
+# --- 足の切り替え ---
+
+def _ns(index):
+    return np.asarray(index, dtype="datetime64[ns]").view("i8")
+
+
+def resample(df, step):
+    """時刻順の OHLCV を step 幅の足にまとめる。ラベルは足の始まり (週足は月曜)。"""
+    if step is None or len(df) == 0:
+        return df
+    step = pd.Timedelta(step).value
+    key = (_ns(df.index) - ORIGIN) // step
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    ends = np.r_[starts[1:], len(key)] - 1
+    out = {}
+    for col in df.columns:
+        v = df[col].to_numpy(dtype=float)
+        how = AGG.get(col, "last")
+        if how == "first":
+            out[col] = v[starts]
+        elif how == "last":
+            out[col] = v[ends]
+        elif how == "max":
+            out[col] = np.fmax.reduceat(v, starts)
+        elif how == "min":
+            out[col] = np.fmin.reduceat(v, starts)
+        else:
+            out[col] = np.add.reduceat(np.nan_to_num(v), starts)
+    idx = pd.DatetimeIndex((key[starts] * step + ORIGIN).astype("datetime64[ns]"), name=df.index.name)
+    return pd.DataFrame(out, index=idx)
+
+
+def is_intraday(interval):
+    return INTERVALS[interval][0] == INTRADAY
+
+
+def window_start(interval, start=None):
+    """実際に読む期間の始まり。日足・週足は start、分足・時間足は既定の表示期間に休場日の余裕を足して決める。"""
+    span = INTERVALS[interval][2]
+    if not is_intraday(interval):
+        return pd.Timestamp(start) if start is not None else pd.Timestamp.now().normalize() - span
+    return pd.Timestamp.now().normalize() - span - SESSION_SLACK
+
+
+def last_sessions(df, n):
+    """日中足のうち、バーのある最後の n 日だけを残す (週末や開場前でも直近の取引日が出るように)。"""
+    if len(df) == 0:
+        return df
+    days = df.index.normalize()
+    sessions = days.unique()
+    return df[days >= sessions[-n]] if len(sessions) > n else df
+
+
+def load_bars(symbol, interval="1d", start=None, columns=None, fetch=None):
+    """interval の足で OHLCV を返す。元の足 (1 分足か日足) を読み、必要ならまとめ直す。"""
+    base, step, _ = INTERVALS[interval]
+    start = window_start(interval, start)
+    if base == INTRADAY:
+        df = last_sessions(load_intraday(symbol, start, fetch, columns=columns), INTERVALS[interval][2].days)
+    else:
+        df = load_history(symbol, start, fetch)
+        if columns is not None:
+            df = df[columns]
+    return resample(df, step)
+
+
+# --- 多数銘柄の一括取得 ---
+
+def _split(data, symbols):
+    # 複数銘柄の yf.download (列: (Ticker, Price)) を銘柄ごとに分ける
+    if data is None or len(data) == 0:
+        return {}
+    if not isinstance(data.columns, pd.MultiIndex):
+        return {symbols[0]: data} if len(symbols) == 1 else {}
+    have = set(data.columns.get_level_values(0))
+    return {s: data[s] for s in symbols if s in have}
+
+
+def read_many(symbols, start):
+    """保存済みの日足だけを {銘柄: DataFrame} で返す (ネットには行かない)。"""
+    start = pd.Timestamp(start)
+    out = {}
+    for s in symbols:
+        df = read(s)
+        if df is not None and not df.empty:
+            out[s] = df[df.index >= start]
+    return out
+
+
+def load_many(symbols, start, fetch_many=None, batch=BATCH, workers=4, refresh_after=REFRESH_AFTER):
+    """多数の銘柄の start 以降の日足を返す。
+
+    期限内のものはファイルから読み、古いものだけを batch 銘柄ずつ 1 回の取得にまとめる。
+    保存済みの銘柄は最終バーの 1 本前 (銘柄の中で最も古いもの) から、未保存の銘柄は start から取る。
+    """
+    start = pd.Timestamp(start)
+    fetch_many = fetch_many or _default_fetch_many
+    out, stored, requested, missing = {}, {}, {}, []
+    for s in dict.fromkeys(symbols):
+        df, requested[s] = read(s), requested_start(s)
+        if not _covers(df, start, requested[s]):
+            missing.append(s)
+        elif time.time() - _path(s).stat().st_mtime < refresh_after:
+            out[s] = df
+        else:
+            stored[s] = df
+    delta = list(stored)
+    perf.count("price_store.hit", len(out))
+    perf.count("price_store.delta", len(delta))
+    perf.count("price_store.miss", len(missing))
+
+    def one(chunk, covered):
+        since = min(_since(stored[s]) for s in chunk) if covered else start
+        try:
+            parts = _split(fetch_many(chunk, since), chunk)
+        except Exception as e:
+            perf.error("fetch_many", e, f"{chunk[0]} ({len(chunk)} symbols)")
+            parts = {}
+        res, redo = {}, []
+        for s in chunk:
+            if s not in parts:
+                # 取れなかった銘柄は手元の履歴を返し、ファイルは更新しない (次回また取りに行く)
+                if covered:
+                    res[s] = stored[s]
+                continue
+            df = _normalize(parts[s])
+            if covered:
+                if not _consistent(stored[s], df):
+                    redo.append(s)
+                    continue
+                df = pd.concat([stored[s], df])
+                df = df[~df.index.duplicated(keep="last")].sort_index()
+            if not df.empty:
+                write(s, df, None if covered else start)
+                res[s] = df
+        if redo:
+            # 分割・配当で調整し直された銘柄は、保存済みの期間ごとまとめて取り直す
+            perf.count("price_store.readjust", len(redo))
+            since = min(start, *(_origin(stored[s], requested[s]) for s in redo))
+            try:
+                parts = _split(fetch_many(redo, since), redo)
+            except Exception as e:
+                perf.error("fetch_many", e, f"{redo[0]} ({len(redo)} symbols)")
+                parts = {}
+            for s in redo:
+                df = _normalize(parts[s]) if s in parts else pd.DataFrame()
+                if df.empty:
+                    res[s] = stored[s]
+                    continue
+                write(s, df, since)
+                res[s] = df
+        return res
+
+    jobs = [(group[i:i + batch], covered) for group, covered in ((delta, True), (missing, False))
+            for i in range(0, len(group), batch)]
+    if jobs:
+        with ThreadPoolExecutor(max_workers=min(workers, len(jobs))) as ex:
+            for res in ex.map(lambda job: one(*job), jobs):
+                out.update(res)
+        evict()
+    return {s: df[df.index >= start] for s, df in out.items()}
+
+
+def evict(max_bytes=MAX_BYTES, max_age=MAX_AGE):
+    """古いファイルを消し、合計サイズが上限を超えたら使われていない順に消す。"""
+    if not OHLCV_DIR.exists():
+        return
+    now = time.time()
+    files = []
+    for p in OHLCV_DIR.rglob("*.parquet"):
+        st_ = p.stat()
+        last_used = max(st_.st_atime, st_.st_mtime)
+        if now - last_used > max_age:
+            p.unlink(missing_ok=True)
+            p.with_suffix(".start").unlink(missing_ok=True)
+        else:
+            files.append((last_used, st_.st_size, p))
+    total = sum(size for _, size, _ in files)
+    for _, size, p in sorted(files):
+        if total <= max_bytes:
+            break
+        p.unlink(missing_ok=True)
+        p.with_suffix(".start").unlink(missing_ok=True)
+        total -= size
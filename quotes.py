@@ -0,0 +1,100 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import dataplane
+
+# --- 相場取得レイヤー ---
+# provider は yf.download と同じ呼び出し形 (tickers, period=..., progress=...) を持つ関数。
+# オフライン検証ではスタブ関数を渡せばよい。
+
+
+def _default_provider(tickers, **kw):
+    import yfinance as yf
+    dataplane.throttle()
+    return yf.download(tickers, **kw)
+
+
+def _close_frame(data, tickers):
+    # yfinance は単一/複数銘柄やバージョンで列の形が変わるので Close を (日付 × 銘柄) に揃える
+    if data is None or len(data) == 0:
+        return pd.DataFrame(columns=tickers, dtype=float)
+    if isinstance(data.columns, pd.MultiIndex):
+        lv0 = data.columns.get_level_values(0)
+        if "Close" in lv0:
+            close = data["Close"]
+        else:
+            close = data.xs("Close", axis=1, level=1)
+    else:
+        close = data[["Close"]]
+        close.columns = tickers[:1]
+    if isinstance(close, pd.Series):
+        close = close.to_frame(tickers[0])
+    return close.reindex(columns=tickers).astype(float)
+
+
+def _last_valid(close):
+    # 取引所ごとに休場日が違うので、各列の最後の有効値を取る
+    if close.empty:
+        return pd.Series(np.nan, index=close.columns)
+    return close.ffill().iloc[-1]
+
+
+def fetch_quotes(tickers, provider=None, max_workers=8, period="5d"):
+    """全銘柄の最新値を一括取得し、price / latency / errors / source の表で返す。"""
+    provider = provider or _default_provider
+    tickers = list(dict.fromkeys(t for t in tickers if t))
+    out = pd.DataFrame({
+        "price": np.nan, "latency": np.nan, "errors": 0, "source": "",
+    }, index=pd.Index(tickers, name="銘柄"))
+    if not tickers:
+        return out
+
+    # 1. まとめて一回で取得
+    start = time.perf_counter()
+    try:
+        data = provider(tickers, period=period, progress=False)
+        last = _last_valid(_close_frame(data, tickers))
+    except Exception:
+        last = pd.Series(np.nan, index=tickers)
+    elapsed = time.perf_counter() - start
+    ok = last.notna()
+    out.loc[ok[ok].index, "price"] = last[ok]
+    out.loc[ok[ok].index, "source"] = "batch"
+    out["latency"] = elapsed
+    out.loc[~ok, "errors"] = 1
+
+    # 2. 取れなかった銘柄だけ個別にスレッドで再取得
+    missing = list(ok[~ok].index)
+    if missing:
+        def one(t):
+            s = time.perf_counter()
+            try:
+                p = _last_valid(_close_frame(provider(t, period=period, progress=False), [t]))[t]
+            except Exception:
+                p = np.nan
+            return t, p, time.perf_counter() - s
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as ex:
+            for t, p, lat in ex.map(one, missing):
+                out.loc[t, "latency"] += lat
+                if np.isnan(p):
+                    out.loc[t, "errors"] += 1
+                else:
+                    out.loc[t, ["price", "source"]] = [p, "single"]
+    return out
+
+
+def value_portfolio(data_list, quotes):
+    """保有リストと fetch_quotes の結果から評価額・損益を列演算で出す。"""
+    pf = pd.DataFrame(data_list, columns=["銘柄", "単価", "数量"])
+    pf = pf[pf["数量"] > 0]
+    price = pf["銘柄"].map(quotes["price"]).to_numpy(dtype=float)
+    keep = ~np.isnan(price)
+    qty = pf["数量"].to_numpy(dtype=float)[keep]
+    val = price[keep] * qty
+    cost = pf["単価"].to_numpy(dtype=float)[keep] * qty
+    res = pd.DataFrame({"銘柄": pf["銘柄"].to_numpy()[keep], "評価額": val, "損益": val - cost})
+    return res, float(cost.sum()), float(val.sum())
@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import perf
+
+# --- バックグラウンド更新 ---
+# 取得処理はワーカースレッドが定期的に実行し、結果をスナップショットとして共有する。
+# 画面側はスナップショットを読むだけなので、yfinance が遅くても固まらない。
+# 取得に失敗したら前回の値を出し続ける (stale-while-revalidate)。
+
+Snapshot = namedtuple("Snapshot", "value fetched_at error")
+
+
+class Partial(Exception):
+    """一部だけ取れたときに、取れた分 (value) を持たせて投げる。
+
+    スナップショットは value で更新するが、失敗として扱い RETRY_AFTER で取り直す。
+    """
+
+    def __init__(self, value, message):
+        super().__init__(message)
+        self.value = value
+
+INTERVAL = 300      # 既定の更新間隔 (秒)
+RETRY_AFTER = 30    # 失敗時の再試行間隔
+IDLE_AFTER = 1800   # この秒数だれも読まないキーは更新をやめる
+
+
+class Refresher:
+    def __init__(self, interval=INTERVAL, workers=8, idle_after=IDLE_AFTER, tick=1.0):
+        self.interval, self.idle_after, self.tick = interval, idle_after, tick
+        self._lock = threading.Lock()
+        self._jobs = {}      # key -> {"fn", "interval", "last_read", "due"}
+        self._snaps = {}     # key -> Snapshot
+        self._ready = {}     # key -> 初回スナップショットの到着を知らせる Event
+        self._inflight = set()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="refresher")
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="refresher", daemon=True)
+        self._thread.start()
+
+    def watch(self, key, fn, interval=None):
+        """key の定期取得を登録する (登録済みなら最終参照時刻だけ更新)。"""
+        now = time.time()
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                self._jobs[key] = {"fn": fn, "interval": interval or self.interval, "last_read": now, "due": 0.0}
+                self._ready.setdefault(key, threading.Event())
+                self._wake.set()
+            else:
+                job["last_read"] = now
+
+    def get(self, key, wait=0.0):
+        """最新のスナップショットを返す。初回だけ最大 wait 秒まで到着を待つ。"""
+        ready = self._ready.get(key)
+        if wait and ready is not None:
+            ready.wait(wait)
+        with self._lock:
+            snap = self._snaps.get(key)
+        perf.count("refresher.pending" if snap is None else "refresher.stale" if snap.error else "refresher.hit")
+        return snap
+
+    def read(self, key, fn, wait=0.0, interval=None):
+        self.watch(key, fn, interval)
+        return self.get(key, wait)
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._jobs:
+                self._jobs[key]["due"] = 0.0
+                self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.time()
+            due = []
+            with self._lock:
+                for key, job in list(self._jobs.items()):
+                    if now - job["last_read"] > self.idle_after:
+                        # 使われなくなったキーの値も手放す (銘柄リストごとのキーが溜まり続けないように)
+                        del self._jobs[key]
+                        self._snaps.pop(key, None)
+                        self._ready.pop(key, None)
+                    elif key not in self._inflight and now >= job["due"]:
+                        self._inflight.add(key)
+                        due.append((key, job["fn"]))
+            for key, fn in due:
+                self._pool.submit(self._refresh, key, fn)
+            self._wake.wait(self.tick)
+            self._wake.clear()
+
+    def _refresh(self, key, fn):
+        try:
+            value, error = fn(), None
+        except Partial as e:
+            perf.error("refresh", e, str(key))
+            value, error = e.value, f"{type(e).__name__}: {e}"
+        except Exception as e:
+            perf.error("refresh", e, str(key))
+            value, error = None, f"{type(e).__name__}: {e}"
+        now = time.time()
+        with self._lock:
+            self._inflight.discard(key)
+            job = self._jobs.get(key)
+            if job is None:
+                # 取得中に手放されたキーは結果を捨てる
+                return
+            old = self._snaps.get(key)
+            if error is None:
+                self._snaps[key] = Snapshot(value, now, None)
+            elif value is not None:
+                self._snaps[key] = Snapshot(value, now, error)
+            elif old is not None:
+                self._snaps[key] = old._replace(error=error)
+            else:
+                self._snaps[key] = Snapshot(None, None, error)
+            job["due"] = now + (job["interval"] if error is None else min(job["interval"], RETRY_AFTER))
+            ready = self._ready.get(key)
+        if ready is not None:
+            ready.set()
+
+
+def freshness(snap):
+    """スナップショットの鮮度を表示用の文字列にする。"""
+    if snap is None:
+        return "LOADING..."
+    if snap.fetched_at is None:
+        return f"NO DATA ({snap.error})"
+    text = time.strftime("%H:%M:%S", time.localtime(snap.fetched_at))
+    age = int(time.time() - snap.fetched_at)
+    text = f"{text} ({age // 60}m{age % 60:02d}s ago)"
+    return f"{text} · STALE: {snap.error}" if snap.error else text
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared():
+    """プロセス内で 1 つの Refresher (全セッション・全ページで共有)。"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Refresher()
+        return _shared
@@ -0,0 +1,202 @@
+import os
+from functools import partial
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+import batch_scan
+import indicators
+import lppls_confidence
+import lppls_engine
+import metadata
+import perf
+import price_store
+import refresher
+
+# --- マーケット・スクリーナー ---
+# 東証 (.T) の全銘柄 + 主要な暗号資産のような大きなユニバースを、安い処理から順に絞り込む。
+#   1. 全銘柄:          保存済みの日足を 1 枚のパネルにして RSI・25 日かい離を一括計算
+#   2. 上位 PRUNE_TO:   格子探索の LPPLS で最新バーのバブル信頼度を出す
+#   3. 上位 FIT_TOP:    フルの LPPLS フィット (fit_cache・夜間スキャンの結果があればそれを使う)
+# 取得は price_store.load_many が古い銘柄だけをまとめて取りに行き、画面は手元の履歴ですぐに表を出す。
+#
+#   streamlit run screener.py     (ユニバースは環境変数 DRAGON_UNIVERSE かサイドバーで指定)
+
+CRYPTO = ["BTC-USD", "ETH-USD", "XRP-USD", "SOL-USD", "BNB-USD", "DOGE-USD", "ADA-USD", "TRX-USD",
+          "AVAX-USD", "LINK-USD", "DOT-USD", "LTC-USD", "BCH-USD", "XLM-USD", "SHIB-USD"]
+PRUNE_TO = 60
+FIT_TOP = 20
+MIN_BARS = 30
+FIT_COLUMNS = ["tc", "m", "w", "O", "D"]
+
+
+def load_universe(path=None, crypto=True):
+    """銘柄リストを読む。
+
+    テキスト (batch_scan と同じ形式) のほか、JPX の上場銘柄一覧 (data_j.xls など、列「コード」) も読める。
+    .xls には xlrd、.xlsx には openpyxl が要る (入れたくなければ一覧を CSV で保存して渡す)。
+    一覧に「市場・商品区分」があれば内国株式だけを残し、コードに .T を付ける。
+    """
+    syms = []
+    if path:
+        path = Path(path)
+        if path.suffix.lower() in (".xls", ".xlsx", ".csv"):
+            df = pd.read_csv(path, dtype=str) if path.suffix.lower() == ".csv" else pd.read_excel(path, dtype=str)
+            if "市場・商品区分" in df:
+                df = df[df["市場・商品区分"].str.contains("内国株式", na=False)]
+            syms = [f"{c.strip().upper()}.T" for c in df["コード"].dropna()]
+        else:
+            syms = batch_scan.read_universe(path)
+    return list(dict.fromkeys(syms + (CRYPTO if crypto else [])))
+
+
+def cheap_stage(frames):
+    """段階 1: 全銘柄の指標と、RSI の偏り・かい離の大きさを順位でならしたスコア。"""
+    res = indicators.summary(indicators.panel(frames))
+    res = res[res["close"].notna()].copy()
+    # 単位の違う 2 つを順位 (0..1) にそろえて平均する。買われすぎ・売られすぎのどちらも上に来る
+    res["score"] = (res["rsi"].sub(50).abs().rank(pct=True) + res["deviation"].abs().rank(pct=True)) / 2
+    res["last_bar"] = [frames[s].index[-1] for s in res.index]
+    for col in ("pos_conf", "neg_conf", *FIT_COLUMNS):
+        res[col] = float("nan")
+    res["crit_date"] = pd.NaT
+    res["fit_error"] = None
+    res["stage"] = 1
+    res.index.name = "symbol"
+    return res.sort_values("score", ascending=False)
+
+
+def grid_stage(res, obs_map, prune_to=PRUNE_TO, workers=None, signal=lppls_confidence.signal):
+    """段階 2: スコア上位だけ格子探索の LPPLS 信頼度を付ける。"""
+    top = list(res.index[:prune_to])
+    sig = signal({s: obs_map[s] for s in top}, workers=workers)
+    res.loc[sig.index, ["pos_conf", "neg_conf"]] = sig.to_numpy()
+    res.loc[sig.index, "stage"] = 2
+    return res
+
+
+def fit_candidates(res, fit_top=FIT_TOP):
+    # 信頼度 (上昇・下落の大きい方) の高い順、同じならスコア順
+    sig = res[["pos_conf", "neg_conf"]].max(axis=1).fillna(-1)
+    return list(res.assign(_sig=sig).sort_values(["_sig", "score"], ascending=False).index[:fit_top])
+
+
+def apply_fit(res, sym, fit, err):
+    if fit:
+        res.loc[sym, FIT_COLUMNS] = [fit.tc, fit.m, fit.w, fit.O, fit.D]
+        res.loc[sym, "crit_date"] = lppls_engine.to_timestamp(fit.tc).normalize()
+    else:
+        res.loc[sym, "fit_error"] = err
+    res.loc[sym, "stage"] = 3
+
+
+def screen(frames, prune_to=PRUNE_TO, fit_top=FIT_TOP, workers=None, timeout=60, max_searches=20,
+           signal=lppls_confidence.signal):
+    """段階ごとに (段階, 結果の表) を yield する。段階 3 はフィットが 1 つ終わるたびに yield する。"""
+    frames = {s: df for s, df in frames.items() if len(df) > MIN_BARS}
+    if not frames:
+        return
+    with perf.span("screen.indicators"):
+        res = cheap_stage(frames)
+    yield 1, res
+
+    with perf.span("screen.grid"):
+        obs_map = {s: lppls_engine.observations(frames[s]) for s in res.index[:max(prune_to, fit_top)]}
+        res = grid_stage(res, obs_map, prune_to, workers, signal)
+    yield 2, res
+
+    # 夜間スキャンが同じ期間 (最初と最後のバーが一致) でフィット済みならそれを使い、残りだけをフィットする
+    snapshot = batch_scan.load_snapshot()
+    todo = {}
+    for sym in fit_candidates(res, fit_top):
+        row = snapshot.loc[sym] if sym in snapshot.index and "first_bar" in snapshot else None
+        if (row is not None and pd.notna(row["crit_date"])
+                and pd.Timestamp(row["first_bar"]) == frames[sym].index[0]
+                and pd.Timestamp(row["last_bar"]) == res.loc[sym, "last_bar"]):
+            res.loc[sym, FIT_COLUMNS] = row[FIT_COLUMNS].to_numpy(dtype=float)
+            res.loc[sym, ["crit_date", "stage"]] = [row["crit_date"], 3]
+        else:
+            todo[sym] = obs_map[sym]
+    yield 3, res
+    with perf.span("screen.lppls"):
+        for sym, fit, err in lppls_engine.scan(todo, max_searches=max_searches, workers=workers, timeout=timeout):
+            apply_fit(res, sym, fit, err)
+            yield 3, res
+
+
+# --- 画面 ---
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _cached_signal(obs_map, workers=None):
+    return lppls_confidence.signal(obs_map, workers=workers)
+
+
+def table(res, names, only_candidates=False):
+    view = res[res["stage"] >= 2] if only_candidates else res
+    view = view.assign(name=[names.get(s, "") for s in view.index])
+    return view[["name", "close", "rsi", "deviation", "score", "pos_conf", "neg_conf", "crit_date", "stage", "fit_error"]]
+
+
+COLUMN_CONFIG = {
+    "close": st.column_config.NumberColumn("PRICE", format="%.2f"),
+    "rsi": st.column_config.NumberColumn("RSI", format="%.1f"),
+    "deviation": st.column_config.NumberColumn("DEV 25 (%)", format="%.1f"),
+    "score": st.column_config.ProgressColumn("SCORE", min_value=0.0, max_value=1.0, format="%.2f"),
+    "pos_conf": st.column_config.NumberColumn("BUBBLE", format="%.2f"),
+    "neg_conf": st.column_config.NumberColumn("ANTI-BUBBLE", format="%.2f"),
+    "crit_date": st.column_config.DateColumn("X-DAY"),
+    "stage": st.column_config.NumberColumn("STAGE"),
+}
+
+
+def main():
+    st.set_page_config(page_title="Dragon King Screener", layout="wide")
+    run = perf.start_run("screener")
+    st.markdown('<h1 style="color:#00f2ff; font-family:\'Courier New\', monospace;">DRAGON KING SCREENER</h1>', unsafe_allow_html=True)
+
+    with st.sidebar:
+        path = st.text_input("UNIVERSE FILE", value=os.environ.get("DRAGON_UNIVERSE", ""), help="銘柄リスト (1 行 1 銘柄) か JPX の上場銘柄一覧 (data_j.xls / csv)")
+        crypto = st.checkbox("+ CRYPTO", value=True, help="主要な暗号資産を加える")
+        prune_to = st.number_input("GRID TOP", min_value=1, max_value=1000, value=PRUNE_TO, help="格子探索の LPPLS 信頼度を出す銘柄数 (段階 2)")
+        fit_top = st.number_input("FIT TOP", min_value=0, max_value=500, value=FIT_TOP, help="フルの LPPLS フィットをする銘柄数 (段階 3)")
+        fit_workers = st.number_input("FIT WORKERS", min_value=1, max_value=64, value=min(os.cpu_count() or 1, 64), help="このセッションが同時に投げる LPPLS フィットの数（プロセスプールは全セッション共有で、大きさは DRAGON_FIT_WORKERS か CPU 数）")
+        fit_timeout = st.number_input("FIT TIMEOUT", min_value=5, max_value=600, value=60, help="1 銘柄あたりのフィット制限時間（秒）")
+        only_candidates = st.checkbox("CANDIDATES ONLY", value=False, help="段階 2 以降に残った銘柄だけを表示")
+        show_perf = st.checkbox("PERF PANEL", value=False, help="処理区間ごとの所要時間とキャッシュ状況を表示")
+        perf_box = st.empty()
+
+    try:
+        symbols = load_universe(path.strip(), crypto)
+    except (OSError, ValueError, KeyError, ImportError) as e:
+        st.error(f"UNIVERSE: {type(e).__name__}: {e}")
+        return
+    start = str(price_store.window_start("1d").date())
+
+    # 一括取得は裏で回し、まだ終わっていなければ手元にある履歴だけで表を作る
+    with perf.span("fetch"):
+        snap = refresher.shared().read(("universe", tuple(symbols), start),
+                                       partial(price_store.load_many, symbols, start), wait=3, interval=900)
+        frames = snap.value if snap and snap.value is not None else price_store.read_many(symbols, start)
+    names = {s: metadata.display_name(m, "") for s, m in metadata.cached(frames).items()}
+    status = st.empty()
+    box = st.empty()
+    st.caption(f"UNIVERSE {len(symbols)} · LOADED {len(frames)} · DATA @ {refresher.freshness(snap)}")
+
+    labels = {1: "STAGE 1: RSI / DEVIATION", 2: "STAGE 2: LPPLS GRID", 3: "STAGE 3: LPPLS FIT"}
+    res = None
+    for stage, res in screen(frames, int(prune_to), int(fit_top), int(fit_workers), fit_timeout,
+                             signal=_cached_signal):
+        status.markdown(f"**{labels[stage]}**")
+        box.dataframe(table(res, names, only_candidates), column_config=COLUMN_CONFIG, use_container_width=True, height=600)
+    if res is None:
+        status.markdown("**NO DATA**")
+    else:
+        status.markdown(f"**DONE** · {int((res['stage'] >= 2).sum())} GRID · {int((res['stage'] == 3).sum())} FIT")
+
+    if show_perf:
+        perf.render(perf_box.container(), run)
+
+
+if __name__ == "__main__":
+    main()